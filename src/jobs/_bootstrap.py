@@ -0,0 +1,49 @@
+"""Shared setup for local job submission scripts"""
+
+import atexit
+import sys
+from pathlib import Path
+
+src_dir = Path(__file__).parent.parent
+if str(src_dir) not in sys.path:
+    sys.path.insert(0, str(src_dir))
+
+from utils.snowflake.setup import (
+    get_session_from_config,
+    ensure_compute_pool_ready,
+    ensure_stage_exists,
+)
+
+COMPUTE_POOL = "ML_SANDBOX_TEST"
+STAGE_NAME = "AI_ML.ML.STAGE_ML_SANDBOX_TEST"
+
+_session = None
+_session_params = None
+_ready_stages = set()
+
+
+def get_or_reuse_session():
+    """Return the interpreter-wide Snowflake session, creating it on first use.
+    The session is closed automatically at interpreter exit."""
+    global _session, _session_params
+    if _session is None:
+        _session, _session_params = get_session_from_config()
+        atexit.register(_session.close)
+    return _session, _session_params
+
+
+def prepare(compute_pool=COMPUTE_POOL, stage_name=STAGE_NAME):
+    """Get the shared session and make sure the stage and compute pool are ready.
+    Each stage is only checked once per interpreter; pool readiness is cached
+    for a short TTL by ensure_compute_pool_ready. Errors reading the pool
+    (other than it not existing) propagate, stopping the submission script.
+    Returns (session, session_params, stage_name, compute_pool)."""
+    session, session_params = get_or_reuse_session()
+    
+    if stage_name not in _ready_stages:
+        ensure_stage_exists(session, stage_name)
+        _ready_stages.add(stage_name)
+    
+    ensure_compute_pool_ready(session, compute_pool)
+    
+    return session, session_params, stage_name, compute_pool
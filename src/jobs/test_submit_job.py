@@ -1,18 +1,8 @@
 """Submit a simple ML job to Snowflake"""
 
-import sys
-from pathlib import Path
-
-src_dir = Path(__file__).parent.parent
-if str(src_dir) not in sys.path:
-    sys.path.insert(0, str(src_dir))
+import _bootstrap
 
 from snowflake.ml.jobs import remote
-from utils.snowflake.setup import (
-    get_session_from_config,
-    ensure_compute_pool_ready,
-    ensure_stage_exists,
-)
 from utils.snowflake.job_debug import (
     wait_for_job,
     show_job_logs,
@@ -20,13 +10,7 @@ from utils.snowflake.job_debug import (
     diagnose_job_failure,
 )
 
-session, session_params = get_session_from_config()
-
-compute_pool = "ML_SANDBOX_TEST"
-stage_name = "AI_ML.ML.STAGE_ML_SANDBOX_TEST"
-
-ensure_stage_exists(session, stage_name)
-ensure_compute_pool_ready(session, compute_pool)
+session, session_params, stage_name, compute_pool = _bootstrap.prepare()
 
 @remote(compute_pool, stage_name=stage_name, session=session, database="AI_ML", schema="ML")
 def hello():
@@ -1,21 +1,13 @@
 """Submit a warehouse benchmark job to Snowflake to test different warehouse sizes"""
 
-import sys
+import argparse
 from pathlib import Path
 import json
 from datetime import datetime
 
-src_dir = Path(__file__).parent.parent
-if str(src_dir) not in sys.path:
-    sys.path.insert(0, str(src_dir))
+import _bootstrap
 
 from snowflake.ml.jobs import remote
-from snowflake.snowpark import Session
-from utils.snowflake.setup import (
-    get_session_from_config,
-    ensure_compute_pool_ready,
-    ensure_stage_exists,
-)
 from utils.snowflake.job_debug import (
     wait_for_job,
     show_job_logs,
@@ -24,30 +16,40 @@ from utils.snowflake.job_debug import (
 )
 from utils.snowflake.artifact_utils import download_job_artifacts
 
-session, session_params = get_session_from_config()
-
-compute_pool = "ML_SANDBOX_TEST"
-stage_name = "AI_ML.ML.STAGE_ML_SANDBOX_TEST"
+parser = argparse.ArgumentParser(description="Warehouse benchmark job")
+parser.add_argument("--force", action="store_true", help="Disable the result cache so every query runs on the warehouse")
+args = parser.parse_args()
 
-ensure_stage_exists(session, stage_name)
-ensure_compute_pool_ready(session, compute_pool)
+session, session_params, stage_name, compute_pool = _bootstrap.prepare()
 
 @remote(compute_pool, stage_name=stage_name, session=session, database="AI_ML", schema="ML")
-def warehouse_benchmark():
+def warehouse_benchmark(force=False):
     """
     Runs a suite of basic benchmark tests and times each operation.
     Tests various SQL operations to measure warehouse performance.
+    
+    With force=True the Snowflake result cache is disabled for the session so
+    every query is executed on the warehouse (use for true performance runs).
     """
-    from snowflake.snowpark import Session
+    from snowflake.snowpark.context import get_active_session
     from snowflake.snowpark.functions import (
-        col, count, sum as sf_sum, avg, max as sf_max, min as sf_min,
-        datediff, current_timestamp
+        col, count, avg, max as sf_max, min as sf_min,
+        approx_count_distinct, concat_ws, lit
     )
-    from io import BytesIO
+    from snowflake.snowpark.window import Window
+    from concurrent.futures import ThreadPoolExecutor
+    from contextlib import nullcontext
+    from io import BytesIO, TextIOWrapper
     import time
     import json
     
-    session = Session.builder.getOrCreate()
+    try:
+        from opentelemetry import trace
+        tracer = trace.get_tracer("warehouse_benchmark")
+    except ImportError:
+        trace = tracer = None
+    
+    session = get_active_session()
     
     stage_name = "AI_ML.ML.STAGE_ML_SANDBOX_TEST"
     
@@ -55,59 +57,132 @@ def warehouse_benchmark():
     # HARD LIMIT: Maximum rows to process in any single operation.
     MAX_QUERY_ROWS = 10000000
     MAX_TABLE_ROWS = MAX_QUERY_ROWS * 10
+    SORT_TOP_K = 1000
+    # Answer Tests 1-3 (count, filtered count, min/max/avg) from a single scan.
+    # Set to False to time each test separately, matching older benchmark runs.
+    BATCH_SCANS = True
+    # Run Tests 4-10 in parallel on the shared session; the benchmark wall time
+    # becomes the slowest test instead of the sum. Set to False for isolated timings.
+    CONCURRENT_TESTS = True
+    
+    if force:
+        session.sql("ALTER SESSION SET USE_CACHED_RESULT = FALSE").collect()
+    
+    warehouse = session.sql("SELECT CURRENT_WAREHOUSE()").collect()[0][0]
+    warehouse_rows = session.sql(f"SHOW WAREHOUSES LIKE '{warehouse}'").collect() if warehouse else []
+    warehouse_size = warehouse_rows[0]["size"] if warehouse_rows else None
     
     results = {
         "timestamp": datetime.now().isoformat(),
-        "warehouse": session.sql("SELECT CURRENT_WAREHOUSE()").collect()[0][0],
-        "warehouse_size": session.sql("SELECT CURRENT_WAREHOUSE()").collect()[0][0],
+        "warehouse": warehouse,
+        "warehouse_size": warehouse_size,
         "max_query_rows": MAX_QUERY_ROWS,
         "max_table_rows": MAX_TABLE_ROWS,
+        "batch_scans": BATCH_SCANS,
+        "concurrent_tests": CONCURRENT_TESTS,
+        "use_cached_result": not force,
         "tests": {}
     }
+    
+    def test_span(name, **attributes):
+        """Open an OpenTelemetry span for one test (yields None if tracing is unavailable)."""
+        if tracer is None:
+            return nullcontext()
+        return tracer.start_as_current_span(
+            name, attributes={"max_rows": MAX_QUERY_ROWS, **attributes}
+        )
+    
     # NO DATE FILTERS - they cause massive scans even with limits.
-    # HARD LIMIT: Initial table limited to MAX_TABLE_ROWS, queries limited to MAX_QUERY_ROWS.
+    # HARD LIMIT: Initial table limited to MAX_TABLE_ROWS, tests run on a cached MAX_QUERY_ROWS sample.
     weather_df = session.table("DWH_DEV.PSUPPLY.WEATHER_HISTORICAL").limit(MAX_TABLE_ROWS)
     
-    print("Test 1: Simple scan with hard limit...")
+    # Materialize one MAX_QUERY_ROWS sample into a temp table so every test runs
+    # against the same rows and the base table is scanned only once. Only the
+    # columns the tests touch are kept, so later scans read fewer bytes.
+    print("Materializing benchmark sample...")
     start = time.time()
-    limited_df = weather_df.limit(MAX_QUERY_ROWS)
-    row_count = limited_df.count()
-    elapsed = time.time() - start
+    sample_df = weather_df.select(
+        col("MSRMT_TIME"), col("LAT"), col("LON"), col("VARIABLE"), col('"VALUE"')
+    ).limit(MAX_QUERY_ROWS).cache_result()
+    results["sample_cache_seconds"] = round(time.time() - start, 3)
+    print(f"  ✓ Cached sample in {results['sample_cache_seconds']:.3f}s")
+    
+    agg_columns = [
+        sf_min(col("LAT")).alias("min_lat"),
+        sf_max(col("LAT")).alias("max_lat"),
+        avg(col("LAT")).alias("avg_lat"),
+        sf_min(col('"VALUE"')).alias("min_value"),
+        sf_max(col('"VALUE"')).alias("max_value"),
+        avg(col('"VALUE"')).alias("avg_value")
+    ]
+    
+    scan_phase_start = time.time()
+    with test_span("scan_tests", batched=BATCH_SCANS) as span:
+        if BATCH_SCANS:
+            # Tests 1-3 share one scan; the wall-clock time is split evenly between them.
+            print("Tests 1-3: Scan, filtered scan and aggregation (batched)...")
+            start = time.time()
+            agg_job = sample_df.agg(
+                count("*").alias("total_rows"),
+                count(col("VARIABLE")).alias("filtered_rows"),
+                *agg_columns
+            ).collect(block=False)
+            agg_result = agg_job.result()[0]
+            elapsed = time.time() - start
+            scan_query_id = filter_query_id = agg_query_id = agg_job.query_id
+            row_count = agg_result["TOTAL_ROWS"]
+            filtered_count = agg_result["FILTERED_ROWS"]
+            scan_elapsed = filter_elapsed = agg_elapsed = elapsed / 3
+            print(f"  ✓ Batched scan completed in {elapsed:.3f}s")
+        else:
+            print("Test 1: Simple scan with hard limit...")
+            start = time.time()
+            scan_job = sample_df.count(block=False)
+            row_count = scan_job.result()
+            scan_elapsed = time.time() - start
+            scan_query_id = scan_job.query_id
+            print(f"  ✓ Scanned {row_count} rows in {scan_elapsed:.3f}s")
+            
+            print("Test 2: Filtered scan...")
+            start = time.time()
+            filter_job = sample_df.filter(col("VARIABLE").is_not_null()).count(block=False)
+            filtered_count = filter_job.result()
+            filter_elapsed = time.time() - start
+            filter_query_id = filter_job.query_id
+            print(f"  ✓ Filtered to {filtered_count} rows in {filter_elapsed:.3f}s")
+            
+            print("Test 3: Aggregation (min/max/avg)...")
+            start = time.time()
+            agg_job = sample_df.agg(*agg_columns).collect(block=False)
+            agg_result = agg_job.result()[0]
+            agg_elapsed = time.time() - start
+            agg_query_id = agg_job.query_id
+            print(f"  ✓ Aggregation completed in {agg_elapsed:.3f}s")
+        
+        if span is not None:
+            span.set_attribute("rows_returned", row_count)
+            span.set_attribute("rows_filtered", filtered_count)
+    results["scan_tests_wall_seconds"] = round(time.time() - scan_phase_start, 3)
+    
     results["tests"]["limited_scan"] = {
         "description": f"Scan {MAX_QUERY_ROWS} rows (sampled)",
         "rows": row_count,
-        "time_seconds": round(elapsed, 3)
+        "time_seconds": round(scan_elapsed, 3),
+        "batched": BATCH_SCANS,
+        "query_id": scan_query_id
     }
-    print(f"  ✓ Scanned {row_count} rows in {elapsed:.3f}s")
-    
-    print("Test 2: Filtered scan...")
-    start = time.time()
-    filtered_df = weather_df.filter(col("VARIABLE").is_not_null()).limit(MAX_QUERY_ROWS)
-    filtered_count = filtered_df.count()
-    elapsed = time.time() - start
     results["tests"]["filtered_scan"] = {
         "description": f"Filter by VARIABLE, limited to {MAX_QUERY_ROWS} rows",
         "rows": filtered_count,
-        "time_seconds": round(elapsed, 3)
+        "time_seconds": round(filter_elapsed, 3),
+        "batched": BATCH_SCANS,
+        "query_id": filter_query_id
     }
-    print(f"  ✓ Filtered to {filtered_count} rows in {elapsed:.3f}s")
-    
-    print("Test 3: Aggregation (min/max/avg)...")
-    start = time.time()
-    sample_for_agg = weather_df.limit(MAX_QUERY_ROWS)
-    agg_df = sample_for_agg.agg(
-        sf_min(col("LAT")).alias("min_lat"),
-        sf_max(col("LAT")).alias("max_lat"),
-        avg(col("LAT")).alias("avg_lat"),
-        sf_min(col('"VALUE"')).alias("min_value"),
-        sf_max(col('"VALUE"')).alias("max_value"),
-        avg(col('"VALUE"')).alias("avg_value")
-    )
-    agg_result = agg_df.collect()[0]
-    elapsed = time.time() - start
     results["tests"]["aggregation"] = {
         "description": f"Aggregation on {MAX_QUERY_ROWS} rows",
-        "time_seconds": round(elapsed, 3),
+        "time_seconds": round(agg_elapsed, 3),
+        "batched": BATCH_SCANS,
+        "query_id": agg_query_id,
         "result": {
             "min_lat": float(agg_result["MIN_LAT"]) if agg_result["MIN_LAT"] else None,
             "max_lat": float(agg_result["MAX_LAT"]) if agg_result["MAX_LAT"] else None,
@@ -117,172 +192,284 @@ def warehouse_benchmark():
             "avg_value": float(agg_result["AVG_VALUE"]) if agg_result["AVG_VALUE"] else None
         }
     }
-    print(f"  ✓ Aggregation completed in {elapsed:.3f}s")
     
-    print("Test 4: Group by aggregation...")
-    start = time.time()
-    sample_for_group = weather_df.limit(MAX_QUERY_ROWS)
-    grouped_df = sample_for_group.select(
-        (col("LAT").cast("int")).alias("lat_bucket"),
-        (col("LON").cast("int")).alias("lon_bucket"),
-        col("VARIABLE"),
-        col('"VALUE"')  # VALUE is a reserved word, must be quoted
-    ).group_by("lat_bucket", "lon_bucket", "VARIABLE").agg(
-        count("*").alias("count"),
-        avg(col('"VALUE"')).alias("avg_value")
-    ).limit(MAX_QUERY_ROWS)
-    group_count = grouped_df.count()
-    elapsed = time.time() - start
-    results["tests"]["group_by"] = {
-        "description": f"Group by rounded lat/lon/variable on {MAX_QUERY_ROWS} rows (max {MAX_QUERY_ROWS} groups)",
-        "groups": group_count,
-        "time_seconds": round(elapsed, 3)
-    }
-    print(f"  ✓ Grouped into {group_count} groups in {elapsed:.3f}s")
-    
-    print("Test 5: Join operation...")
-    try:
-        grid_points_df = session.table("DWH_DEV.PSUPPLY.WEATHER_GRID_POINTS")
-        sample_grid = grid_points_df.limit(10)
-        sample_weather = weather_df.limit(MAX_QUERY_ROWS)
-        
+    def run_group_by_test():
+        print("Test 4: Distinct group count (approximate)...")
         start = time.time()
-        joined = sample_grid.join(
-            sample_weather,
-            (sample_grid["LAT"] == sample_weather["LAT"]) & 
-            (sample_grid["LON"] == sample_weather["LON"]),
-            "inner"
-        ).limit(MAX_QUERY_ROWS)
-        join_count = joined.count()
+        # Only the number of groups is reported, so estimate it with a HyperLogLog
+        # sketch instead of materializing every group (Test 8 covers a real GROUP BY).
+        group_key = concat_ws(
+            lit("|"),
+            col("LAT").cast("int").cast("string"),
+            col("LON").cast("int").cast("string"),
+            col("VARIABLE")
+        )
+        group_job = sample_df.select(
+            approx_count_distinct(group_key).alias("groups")
+        ).collect(block=False)
+        group_count = group_job.result()[0]["GROUPS"]
         elapsed = time.time() - start
-        results["tests"]["join"] = {
-            "description": f"Join 10 grid points with {MAX_QUERY_ROWS} weather rows (max {MAX_QUERY_ROWS} results)",
-            "result_rows": join_count,
-            "time_seconds": round(elapsed, 3)
-        }
-        print(f"  ✓ Join produced {join_count} rows in {elapsed:.3f}s")
-    except Exception as e:
-        results["tests"]["join"] = {
-            "description": "Join grid points with weather data",
-            "error": str(e),
-            "time_seconds": None
+        print(f"  ✓ Estimated {group_count} groups in {elapsed:.3f}s")
+        return {
+            "description": f"Approximate distinct rounded lat/lon/variable groups on {MAX_QUERY_ROWS} rows",
+            "groups": group_count,
+            "time_seconds": round(elapsed, 3),
+            "query_id": group_job.query_id
         }
-        print(f"  ✗ Join test failed: {e}")
     
-    print("Test 6: Sorting...")
-    start = time.time()
-    sample_for_sort = weather_df.limit(MAX_QUERY_ROWS)
-    sorted_df = sample_for_sort.order_by(
-        col("MSRMT_TIME").desc(), 
-        col('"VALUE"').desc()
-    ).limit(MAX_QUERY_ROWS)
-    sorted_count = sorted_df.count()
-    elapsed = time.time() - start
-    results["tests"]["sorting"] = {
-        "description": f"Sort {MAX_QUERY_ROWS} rows by time/value desc, take top {MAX_QUERY_ROWS}",
-        "rows": sorted_count,
-        "time_seconds": round(elapsed, 3)
-    }
-    print(f"  ✓ Sorted and retrieved {sorted_count} rows in {elapsed:.3f}s")
+    def run_join_test():
+        print("Test 5: Join operation...")
+        try:
+            grid_points_df = session.table("DWH_DEV.PSUPPLY.WEATHER_GRID_POINTS")
+            # Snap both sides to a fixed precision so "exact match" is meaningful for
+            # float coordinates. The 10-row grid side is kept on the build side of the join
+            # so the optimizer can broadcast it instead of shuffling the weather sample.
+            sample_grid = grid_points_df.limit(10).select(
+                col("LAT").cast("decimal(6,3)").alias("GRID_LAT_KEY"),
+                col("LON").cast("decimal(6,3)").alias("GRID_LON_KEY")
+            )
+            sample_weather = sample_df.select(
+                col("LAT").cast("decimal(6,3)").alias("LAT_KEY"),
+                col("LON").cast("decimal(6,3)").alias("LON_KEY")
+            )
+            
+            start = time.time()
+            joined = sample_weather.join(
+                sample_grid,
+                (sample_weather["LAT_KEY"] == sample_grid["GRID_LAT_KEY"]) & 
+                (sample_weather["LON_KEY"] == sample_grid["GRID_LON_KEY"]),
+                "inner"
+            ).limit(MAX_QUERY_ROWS)
+            join_job = joined.count(block=False)
+            join_count = join_job.result()
+            elapsed = time.time() - start
+            
+            # Keep the plan so the join strategy can be checked after the run.
+            join_sql = joined.queries["queries"][-1]
+            join_plan = [
+                row[0] for row in session.sql(f"EXPLAIN USING TEXT {join_sql}").collect()
+            ]
+            print(f"  ✓ Join produced {join_count} rows in {elapsed:.3f}s")
+            return {
+                "description": f"Join 10 grid points with {MAX_QUERY_ROWS} weather rows on 3-decimal lat/lon keys (max {MAX_QUERY_ROWS} results)",
+                "result_rows": join_count,
+                "time_seconds": round(elapsed, 3),
+                "query_id": join_job.query_id,
+                "explain": join_plan
+            }
+        except Exception as e:
+            print(f"  ✗ Join test failed: {e}")
+            return {
+                "description": "Join grid points with weather data",
+                "error": str(e),
+                "time_seconds": None
+            }
     
-    print("Test 7: Window function...")
-    from snowflake.snowpark.window import Window
-    start = time.time()
-    sample_for_window = weather_df.limit(MAX_QUERY_ROWS)
-    window_df = sample_for_window.select(
-        col("MSRMT_TIME"),
-        col("LAT"),
-        col('"VALUE"'),
-        avg(col('"VALUE"')).over(
-            Window.partition_by((col("LAT").cast("int")))
-        ).alias("avg_value_by_lat_bucket")
-    ).limit(MAX_QUERY_ROWS)
-    window_count = window_df.count()
-    elapsed = time.time() - start
-    results["tests"]["window_function"] = {
-        "description": f"Window function on {MAX_QUERY_ROWS} rows, partitioned by rounded LAT",
-        "rows": window_count,
-        "time_seconds": round(elapsed, 3)
-    }
-    print(f"  ✓ Window function completed on {window_count} rows in {elapsed:.3f}s")
+    def run_sorting_test():
+        print("Test 6: Sorting (top-K)...")
+        start = time.time()
+        sort_job = sample_df.order_by(
+            col("MSRMT_TIME").desc(), 
+            col('"VALUE"').desc()
+        ).limit(SORT_TOP_K).collect(block=False)
+        top_rows = sort_job.result()
+        elapsed = time.time() - start
+        print(f"  ✓ Sorted and retrieved {len(top_rows)} rows in {elapsed:.3f}s")
+        return {
+            "description": f"Sort {MAX_QUERY_ROWS} rows by time/value desc, collect top {SORT_TOP_K}",
+            "rows": len(top_rows),
+            "time_seconds": round(elapsed, 3),
+            "query_id": sort_job.query_id
+        }
     
-    print("Test 8: Complex query (multiple operations)...")
-    start = time.time()
-    sample_for_complex = weather_df.limit(MAX_QUERY_ROWS)
-    complex_df = (
-        sample_for_complex.filter(col("LAT").is_not_null())
-        .filter(col('"VALUE"').is_not_null())
-        .select(
-            (col("LAT").cast("int")).alias("lat_bucket"),
-            (col("LON").cast("int")).alias("lon_bucket"),
-            col("VARIABLE"),
-            col('"VALUE"')
-        )
-        .group_by("lat_bucket", "lon_bucket", "VARIABLE")
-        .agg(
-            count("*").alias("count"),
-            avg(col('"VALUE"')).alias("avg_value")
+    def run_window_function_test():
+        print("Test 7: Window function...")
+        start = time.time()
+        window_df = sample_df.select(
+            col("MSRMT_TIME"),
+            col("LAT"),
+            col('"VALUE"'),
+            avg(col('"VALUE"')).over(
+                Window.partition_by((col("LAT").cast("int")))
+            ).alias("avg_value_by_lat_bucket")
         )
-        .filter(col("count") > 1)
-        .order_by(col("avg_value").desc())
-        .limit(MAX_QUERY_ROWS)
-    )
-    complex_count = complex_df.count()
-    elapsed = time.time() - start
-    results["tests"]["complex_query"] = {
-        "description": f"Complex query: Filter -> Select -> Group -> Filter -> Sort -> Limit on {MAX_QUERY_ROWS} rows",
-        "rows": complex_count,
-        "time_seconds": round(elapsed, 3)
-    }
-    print(f"  ✓ Complex query returned {complex_count} rows in {elapsed:.3f}s")
+        window_job = window_df.count(block=False)
+        window_count = window_job.result()
+        elapsed = time.time() - start
+        print(f"  ✓ Window function completed on {window_count} rows in {elapsed:.3f}s")
+        return {
+            "description": f"Window function on {MAX_QUERY_ROWS} rows, partitioned by rounded LAT",
+            "rows": window_count,
+            "time_seconds": round(elapsed, 3),
+            "query_id": window_job.query_id
+        }
     
-    print("Test 9: Data write (temp table)...")
-    try:
-        temp_table_name = f"TEMP_BENCHMARK_{int(time.time())}"
+    def run_complex_query_test():
+        print("Test 8: Complex query (multiple operations)...")
         start = time.time()
-        sample_for_write = weather_df.limit(MAX_QUERY_ROWS)
-        sample_for_write.write.mode("overwrite").save_as_table(temp_table_name, table_type="temporary")
+        complex_df = (
+            sample_df.filter(col("LAT").is_not_null())
+            .filter(col('"VALUE"').is_not_null())
+            .select(
+                (col("LAT").cast("int")).alias("lat_bucket"),
+                (col("LON").cast("int")).alias("lon_bucket"),
+                col("VARIABLE"),
+                col('"VALUE"')
+            )
+            .group_by("lat_bucket", "lon_bucket", "VARIABLE")
+            .agg(
+                count("*").alias("count"),
+                avg(col('"VALUE"')).alias("avg_value")
+            )
+            .filter(col("count") > 1)
+            .order_by(col("avg_value").desc())
+        )
+        complex_job = complex_df.count(block=False)
+        complex_count = complex_job.result()
         elapsed = time.time() - start
-        verify_count = session.table(temp_table_name).count()
-        results["tests"]["data_write"] = {
-            "description": f"Write {MAX_QUERY_ROWS} rows to temporary table",
-            "rows_written": verify_count,
+        print(f"  ✓ Complex query returned {complex_count} rows in {elapsed:.3f}s")
+        return {
+            "description": f"Complex query: Filter -> Select -> Group -> Filter -> Sort on {MAX_QUERY_ROWS} rows",
+            "rows": complex_count,
             "time_seconds": round(elapsed, 3),
-            "temp_table": temp_table_name
+            "query_id": complex_job.query_id
         }
-        print(f"  ✓ Wrote {verify_count} rows to temp table in {elapsed:.3f}s")
-    except Exception as e:
-        results["tests"]["data_write"] = {
-            "description": "Write to temporary table",
-            "error": str(e),
-            "time_seconds": None
+    
+    def run_data_write_test():
+        print("Test 9: Data write (temp table)...")
+        try:
+            temp_table_name = "TEMP_BENCHMARK_WRITE"
+            start = time.time()
+            write_job = sample_df.write.mode("overwrite").save_as_table(
+                temp_table_name, table_type="temporary", block=False
+            )
+            write_job.result()
+            elapsed = time.time() - start
+            # Read the row count from table metadata rather than rescanning the table.
+            row_count_rows = session.sql(f"""
+                SELECT ROW_COUNT
+                FROM INFORMATION_SCHEMA.TABLES
+                WHERE TABLE_SCHEMA = CURRENT_SCHEMA()
+                  AND TABLE_NAME = '{temp_table_name.upper()}'
+                  AND TABLE_TYPE = 'LOCAL TEMPORARY'
+            """).collect()
+            verify_count = row_count_rows[0][0] if row_count_rows else None
+            print(f"  ✓ Wrote {verify_count} rows to temp table in {elapsed:.3f}s")
+            return {
+                "description": f"Write {MAX_QUERY_ROWS} rows to temporary table",
+                "rows_written": verify_count,
+                "time_seconds": round(elapsed, 3),
+                "temp_table": temp_table_name,
+                "query_id": write_job.query_id
+            }
+        except Exception as e:
+            print(f"  ✗ Write test failed: {e}")
+            return {
+                "description": "Write to temporary table",
+                "error": str(e),
+                "time_seconds": None
+            }
+    
+    def run_pandas_conversion_test():
+        print("Test 10: Pandas conversion...")
+        start = time.time()
+        pandas_job = sample_df.to_pandas(block=False)
+        pandas_df = pandas_job.result()
+        elapsed = time.time() - start
+        print(f"  ✓ Converted {len(pandas_df)} rows to pandas in {elapsed:.3f}s")
+        return {
+            "description": f"Convert {MAX_QUERY_ROWS} rows (time/lat/lon/variable/value) to pandas DataFrame via Arrow",
+            "rows": len(pandas_df),
+            "time_seconds": round(elapsed, 3),
+            "query_id": pandas_job.query_id
         }
-        print(f"  ✗ Write test failed: {e}")
     
-    print("Test 10: Pandas conversion...")
-    start = time.time()
-    sample_for_pandas = weather_df.limit(MAX_QUERY_ROWS)
-    pandas_df = sample_for_pandas.to_pandas()
-    elapsed = time.time() - start
-    results["tests"]["pandas_conversion"] = {
-        "description": f"Convert {MAX_QUERY_ROWS} rows to pandas DataFrame",
-        "rows": len(pandas_df),
-        "time_seconds": round(elapsed, 3)
+    independent_tests = {
+        "group_by": run_group_by_test,
+        "join": run_join_test,
+        "sorting": run_sorting_test,
+        "window_function": run_window_function_test,
+        "complex_query": run_complex_query_test,
+        "data_write": run_data_write_test,
+        "pandas_conversion": run_pandas_conversion_test,
     }
-    print(f"  ✓ Converted {len(pandas_df)} rows to pandas in {elapsed:.3f}s")
     
-    total_time = sum(
+    # Force the Arrow result format so to_pandas() in Test 10 takes the columnar fetch path.
+    session.sql("ALTER SESSION SET PYTHON_CONNECTOR_QUERY_RESULT_FORMAT = 'ARROW'").collect()
+    
+    def run_traced(name, fn):
+        with test_span(name) as span:
+            test_result = fn()
+            if span is not None:
+                for key in ("rows", "groups", "result_rows", "rows_written"):
+                    if test_result.get(key) is not None:
+                        span.set_attribute("rows_returned", test_result[key])
+                if "error" in test_result:
+                    span.set_status(trace.Status(trace.StatusCode.ERROR, test_result["error"]))
+            return test_result
+    
+    phase_start = time.time()
+    if CONCURRENT_TESTS:
+        # Per-test times are wall-clock under concurrency, not isolated timings.
+        with ThreadPoolExecutor(max_workers=len(independent_tests)) as executor:
+            futures = {name: executor.submit(run_traced, name, fn) for name, fn in independent_tests.items()}
+            for name, future in futures.items():
+                results["tests"][name] = future.result()
+    else:
+        for name, fn in independent_tests.items():
+            results["tests"][name] = run_traced(name, fn)
+    results["tests_4_10_wall_seconds"] = round(time.time() - phase_start, 3)
+    
+    # Attach scan/pruning/spill stats for every test query. QUERY_HISTORY_BY_SESSION is
+    # used instead of ACCOUNT_USAGE.QUERY_HISTORY, which lags by up to 45 minutes.
+    query_ids = sorted({
+        test["query_id"] for test in results["tests"].values() if test.get("query_id")
+    })
+    if query_ids:
+        quoted_qids = ", ".join(f"'{qid}'" for qid in query_ids)
+        try:
+            stats_rows = session.sql(f"""
+                SELECT query_id, bytes_scanned, partitions_scanned, partitions_total,
+                       bytes_spilled_to_local_storage, bytes_spilled_to_remote_storage
+                FROM TABLE(INFORMATION_SCHEMA.QUERY_HISTORY_BY_SESSION(RESULT_LIMIT => 1000))
+                WHERE query_id IN ({quoted_qids})
+            """).collect()
+            results["query_stats"] = {
+                row["QUERY_ID"]: {
+                    "bytes_scanned": row["BYTES_SCANNED"],
+                    "partitions_scanned": row["PARTITIONS_SCANNED"],
+                    "partitions_total": row["PARTITIONS_TOTAL"],
+                    "bytes_spilled_to_local_storage": row["BYTES_SPILLED_TO_LOCAL_STORAGE"],
+                    "bytes_spilled_to_remote_storage": row["BYTES_SPILLED_TO_REMOTE_STORAGE"],
+                }
+                for row in stats_rows
+            }
+        except Exception as e:
+            results["query_stats_error"] = str(e)
+            print(f"  ✗ Could not fetch query stats: {e}")
+    
+    # Per-test times overlap when CONCURRENT_TESTS is on, so their sum is kept only as
+    # a separate figure; the benchmark total is the wall time of the three phases.
+    results["sum_of_test_seconds"] = round(sum(
         test.get("time_seconds", 0) 
         for test in results["tests"].values() 
         if test.get("time_seconds") is not None
+    ), 3)
+    total_time = (
+        results["sample_cache_seconds"]
+        + results["scan_tests_wall_seconds"]
+        + results["tests_4_10_wall_seconds"]
     )
     results["total_time_seconds"] = round(total_time, 3)
     
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     json_filename = f"{timestamp}_benchmark_results.json"
-    json_data = json.dumps(results, indent=2)
-    json_bytes = json_data.encode("utf-8")
-    json_buffer = BytesIO(json_bytes)
+    json_buffer = BytesIO()
+    json_writer = TextIOWrapper(json_buffer, encoding="utf-8", write_through=True)
+    json.dump(results, json_writer, indent=2, ensure_ascii=False)
+    json_writer.flush()
+    json_writer.detach()
+    json_buffer.seek(0)
     json_stage_path = f"@{stage_name}/output/{json_filename}"
     session.file.put_stream(
         json_buffer,
@@ -293,7 +480,8 @@ def warehouse_benchmark():
     print(f"\n✓ Saved benchmark results to: {json_stage_path}")
     
     print("\n=== Benchmark Summary ===")
-    print(f"Total time: {total_time:.3f}s")
+    print(f"Total time (wall): {total_time:.3f}s")
+    print(f"Sum of test times: {results['sum_of_test_seconds']:.3f}s")
     print("\nIndividual test times:")
     for test_name, test_data in results["tests"].items():
         time_val = test_data.get("time_seconds")
@@ -308,13 +496,14 @@ def warehouse_benchmark():
         "max_query_rows": results["max_query_rows"],
         "max_table_rows": results["max_table_rows"],
         "total_time_seconds": results["total_time_seconds"],
+        "sum_of_test_seconds": results["sum_of_test_seconds"],
         "tests": {k: {"time_seconds": v.get("time_seconds")} for k, v in results["tests"].items()},
         "json_stage_path": json_stage_path
     }
 
 print("\n=== Submitting warehouse benchmark job ===")
 try:
-    job = warehouse_benchmark()
+    job = warehouse_benchmark(force=args.force)
     
     final_status, timed_out, log_file = wait_for_job(job, timeout=3600)
     show_job_logs(job, log_file=log_file)
@@ -334,7 +523,8 @@ try:
         
         print("\n=== Benchmark Results Summary ===")
         print(f"Warehouse: {result.get('warehouse', 'N/A')}")
-        print(f"Total time: {result.get('total_time_seconds', 'N/A')}s")
+        print(f"Total time (wall): {result.get('total_time_seconds', 'N/A')}s")
+        print(f"Sum of test times: {result.get('sum_of_test_seconds', 'N/A')}s")
         print("\nTest breakdown:")
         for test_name, test_data in result.get("tests", {}).items():
             time_val = test_data.get("time_seconds")
@@ -1,19 +1,11 @@
 """Submit a weather correlation analysis job to Snowflake"""
 
-import sys
 from pathlib import Path
 
-src_dir = Path(__file__).parent.parent
-if str(src_dir) not in sys.path:
-    sys.path.insert(0, str(src_dir))
+import _bootstrap
 
 from snowflake.ml.jobs import remote
 from snowflake.snowpark import Session
-from utils.snowflake.setup import (
-    get_session_from_config,
-    ensure_compute_pool_ready,
-    ensure_stage_exists,
-)
 from utils.snowflake.job_debug import (
     wait_for_job,
     show_job_logs,
@@ -22,13 +14,7 @@ from utils.snowflake.job_debug import (
 )
 from utils.snowflake.artifact_utils import download_job_artifacts
 
-session, session_params = get_session_from_config()
-
-compute_pool = "ML_SANDBOX_TEST"
-stage_name = "AI_ML.ML.STAGE_ML_SANDBOX_TEST"
-
-ensure_stage_exists(session, stage_name)
-ensure_compute_pool_ready(session, compute_pool)
+session, session_params, stage_name, compute_pool = _bootstrap.prepare()
 
 @remote(compute_pool, stage_name=stage_name, session=session, database="AI_ML", schema="ML")
 def weather_correlation_analysis():
@@ -37,11 +23,15 @@ def weather_correlation_analysis():
     for the most recent week of data.
     """
     from snowflake.snowpark import Session
-    from snowflake.snowpark.functions import col, datediff, current_timestamp, random, abs as sf_abs
+    from snowflake.snowpark.functions import col, datediff, current_timestamp, random, abs as sf_abs, avg, lit, when
+    from pathlib import Path
+    import tempfile
     from io import BytesIO
     from datetime import datetime
+    import numpy as np
     import pandas as pd
-    import matplotlib.pyplot as plt
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
     
     session = Session.builder.getOrCreate()
     
@@ -61,69 +51,84 @@ def weather_correlation_analysis():
     
     print("\nFetching weather data for all grid points...")
     
-    filter_conditions = []
-    grid_info = []
-    
-    for idx, row in grid_points_df.iterrows():
-        grid_id = int(row['GRID_ID'])
-        lat = float(row['LAT'])
-        lon = float(row['LON'])
-        grid_info.append({"grid_id": grid_id, "lat": lat, "lon": lon})
-        
-        condition = (
-            (sf_abs(col("LAT") - lat) <= tolerance) & 
-            (sf_abs(col("LON") - lon) <= tolerance)
+    grid_info = [
+        {"grid_id": int(grid_id), "lat": float(lat), "lon": float(lon)}
+        for grid_id, lat, lon in grid_points_df[['GRID_ID', 'LAT', 'LON']].itertuples(index=False, name=None)
+    ]
+    
+    # Assign GRID_ID in Snowflake with a CASE over the +/-tolerance box of every
+    # grid point, so the date filter and matching run in one pushed-down query. The
+    # CASE lists later grid points first, so a row near several points gets exactly
+    # one GRID_ID (the last matching point wins) and is never counted twice. A
+    # BETWEEN bounding box over all points is ANDed in front so Snowflake can prune
+    # micro-partitions, which the abs() tests alone don't allow. The matched rows
+    # are cached in a temp table because they are read twice below.
+    grid_id_expr = None
+    for g in reversed(grid_info):
+        in_box = (
+            (sf_abs(col("LAT") - g["lat"]) <= tolerance) &
+            (sf_abs(col("LON") - g["lon"]) <= tolerance)
         )
-        filter_conditions.append(condition)
-    
-    combined_filter = filter_conditions[0]
-    for condition in filter_conditions[1:]:
-        combined_filter = combined_filter | condition
-    
-    weather_df = session.table("DWH_DEV.PSUPPLY.WEATHER_HISTORICAL").filter(
-        combined_filter &
+        if grid_id_expr is None:
+            grid_id_expr = when(in_box, lit(g["grid_id"]))
+        else:
+            grid_id_expr = grid_id_expr.when(in_box, lit(g["grid_id"]))
+    grid_lats = [g["lat"] for g in grid_info]
+    grid_lons = [g["lon"] for g in grid_info]
+    matched = session.table("DWH_DEV.PSUPPLY.WEATHER_HISTORICAL").filter(
+        col("LAT").between(min(grid_lats) - tolerance, max(grid_lats) + tolerance) &
+        col("LON").between(min(grid_lons) - tolerance, max(grid_lons) + tolerance) &
         (datediff("day", col("MSRMT_TIME"), current_timestamp()) <= 60)
-    ).to_pandas()
-    
-    print(f"Retrieved {len(weather_df)} total weather records")
+    ).select(
+        col("MSRMT_TIME"), col("VARIABLE"), col('"VALUE"'), grid_id_expr.alias("GRID_ID")
+    ).filter(col("GRID_ID").is_not_null()).cache_result()
     
-    print("\nMatching weather data to grid points...")
-    weather_df['GRID_ID'] = None
-    
-    for grid_point in grid_info:
-        grid_id = grid_point["grid_id"]
-        lat = grid_point["lat"]
-        lon = grid_point["lon"]
-        
-        mask = (
-            ((weather_df['LAT'] - lat).abs() <= tolerance) &
-            ((weather_df['LON'] - lon).abs() <= tolerance)
-        )
-        weather_df.loc[mask, 'GRID_ID'] = grid_id
-    
-    weather_df = weather_df[weather_df['GRID_ID'].notna()].copy()
+    grid_counts = {
+        row["GRID_ID"]: row["COUNT"]
+        for row in matched.group_by("GRID_ID").count().collect()
+    }
+    total_records = sum(grid_counts.values())
+    print(f"Retrieved {total_records} total weather records")
     
-    if weather_df.empty:
+    if total_records == 0:
         return {
             "error": "No weather data found for any of the selected grid points",
             "grid_points": grid_info
         }
     
-    grid_counts = weather_df['GRID_ID'].value_counts().to_dict()
+    # Pivot in Snowflake: one row per MSRMT_TIME with a conditional AVG per variable,
+    # which also averages duplicate observations across grid points. Columns are
+    # aliased V<i> to keep arbitrary variable names out of the generated SQL.
+    variables = sorted(
+        row["VARIABLE"]
+        for row in matched.select("VARIABLE").filter(col("VARIABLE").is_not_null()).distinct().collect()
+    )
+    wide = matched.group_by("MSRMT_TIME").agg(*[
+        avg(when(col("VARIABLE") == lit(variable), col('"VALUE"'))).alias(f"V{i}")
+        for i, variable in enumerate(variables)
+    ]) if variables else None
+    
     print(f"Records per grid point:")
     for grid_id, count in grid_counts.items():
         print(f"  Grid {grid_id}: {count} records")
     
     print("\nPreparing data for correlation analysis (across all grid points)...")
     
-    weather_pivot = weather_df.pivot_table(
-        index='MSRMT_TIME',
-        columns='VARIABLE',
-        values='VALUE',
-        aggfunc='mean'
-    )
-    
-    weather_pivot = weather_pivot.dropna(axis=1, how='all').dropna(axis=0, how='all')
+    if wide is None:
+        weather_pivot = pd.DataFrame()
+    else:
+        # Fetch through the connector's Arrow path and convert column-wise.
+        wide_queries = wide.queries["queries"]
+        with session.connection.cursor() as cursor:
+            for query in wide_queries[:-1]:
+                cursor.execute(query)
+            cursor.execute(wide_queries[-1])
+            wide_table = cursor.fetch_arrow_all(force_return_table=True)
+        weather_pivot = wide_table.to_pandas(split_blocks=True, self_destruct=True).set_index("MSRMT_TIME")
+        weather_pivot.columns = variables
+        # float32 is plenty for weather values and halves memory through corr.
+        weather_pivot = weather_pivot.apply(pd.to_numeric, downcast='float')
+        weather_pivot = weather_pivot.dropna(axis=1, how='all').dropna(axis=0, how='all')
     
     if weather_pivot.empty or len(weather_pivot.columns) < 2:
         return {
@@ -136,47 +141,63 @@ def weather_correlation_analysis():
     print(f"Time points: {len(weather_pivot)}")
     
     print("Calculating correlation matrix...")
-    correlation_matrix = weather_pivot.corr()
+    # np.corrcoef is BLAS-backed; pandas' pairwise corr() is only needed when values are missing.
+    # Column-major so each variable's series is contiguous (usually already the case).
+    pivot_values = np.asfortranarray(weather_pivot.to_numpy())
+    if np.isnan(pivot_values).any():
+        correlation_matrix = weather_pivot.corr()
+    else:
+        correlation_matrix = pd.DataFrame(
+            np.corrcoef(pivot_values, rowvar=False),
+            index=weather_pivot.columns,
+            columns=weather_pivot.columns,
+        )
     
     print("Creating correlation plot...")
     
     buf = BytesIO()
-    plt.figure(figsize=(12, 12))
-    plt.imshow(correlation_matrix.values, cmap='coolwarm', aspect='auto', vmin=-1, vmax=1)
-    plt.xticks(range(len(correlation_matrix.columns)), correlation_matrix.columns, rotation=90)
-    plt.yticks(range(len(correlation_matrix.index)), correlation_matrix.index)
-    plt.colorbar(label='Correlation')
-    plt.title(f'Weather Variable Correlations - Across {len(grid_info)} Grid Points')
-    plt.xlabel('Variable')
-    plt.ylabel('Variable')
-    plt.tight_layout()
-    plt.savefig(buf, format="png", dpi=300)
-    plt.close()
+    fig = Figure(figsize=(12, 12), dpi=120)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    image = ax.imshow(
+        correlation_matrix.values, cmap='coolwarm', aspect='auto', vmin=-1, vmax=1, interpolation='nearest'
+    )
+    ax.set_xticks(range(len(correlation_matrix.columns)))
+    ax.set_xticklabels(correlation_matrix.columns, rotation=90)
+    ax.set_yticks(range(len(correlation_matrix.index)))
+    ax.set_yticklabels(correlation_matrix.index)
+    fig.colorbar(image, ax=ax, label='Correlation')
+    ax.set_title(f'Weather Variable Correlations - Across {len(grid_info)} Grid Points')
+    ax.set_xlabel('Variable')
+    ax.set_ylabel('Variable')
+    fig.tight_layout()
+    canvas.print_png(buf)
     buf.seek(0)
     
     grid_ids_str = "_".join([str(g["grid_id"]) for g in grid_info])
     png_filename = f"{timestamp}_corr_grids_{grid_ids_str}.png"
     png_stage_path = f"@{stage_name}/output/{png_filename}"
-    session.file.put_stream(
-        buf,
-        png_stage_path,
-        overwrite=True,
-        auto_compress=False,
-    )
-    print(f"Saved plot to: {png_stage_path}")
     
-    csv_filename = f"{timestamp}_corr_matrix_grids_{grid_ids_str}.csv"
-    csv_data = correlation_matrix.to_csv()
-    csv_bytes = csv_data.encode("utf-8")
-    csv_buffer = BytesIO(csv_bytes)
-    csv_stage_path = f"@{stage_name}/output/{csv_filename}"
-    session.file.put_stream(
-        csv_buffer,
-        csv_stage_path,
-        overwrite=True,
-        auto_compress=False,
-    )
-    print(f"Saved CSV to: {csv_stage_path}")
+    parquet_filename = f"{timestamp}_corr_matrix_grids_{grid_ids_str}.parquet"
+    parquet_buffer = BytesIO()
+    correlation_matrix.to_parquet(parquet_buffer, engine="pyarrow", compression="snappy")
+    parquet_buffer.seek(0)
+    parquet_stage_path = f"@{stage_name}/output/{parquet_filename}"
+    
+    # Upload both artifacts with one wildcard PUT instead of a round-trip per file.
+    # utils isn't importable inside this remote function, so this mirrors
+    # save_many_to_stage inline.
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        Path(tmp_dir, png_filename).write_bytes(buf.getvalue())
+        Path(tmp_dir, parquet_filename).write_bytes(parquet_buffer.getvalue())
+        session.file.put(
+            f"{Path(tmp_dir).as_posix()}/*",
+            f"@{stage_name}/output/",
+            auto_compress=False,
+            overwrite=True,
+        )
+    print(f"Saved plot to: {png_stage_path}")
+    print(f"Saved Parquet to: {parquet_stage_path}")
     
     return {
         "timestamp": timestamp,
@@ -185,7 +206,7 @@ def weather_correlation_analysis():
         "variables": list(correlation_matrix.columns),
         "num_time_points": len(weather_pivot),
         "png_stage_path": png_stage_path,
-        "csv_stage_path": csv_stage_path,
+        "parquet_stage_path": parquet_stage_path,
         "summary_stats": {
             "max_correlation": float(correlation_matrix.max().max()),
             "min_correlation": float(correlation_matrix.min().min()),
@@ -208,7 +229,7 @@ try:
             session,
             result,
             artifacts_dir=artifacts_dir,
-            stage_path_keys=["png_stage_path", "csv_stage_path"]
+            stage_path_keys=["png_stage_path", "parquet_stage_path"]
         )
         for key, path in downloaded.items():
             print(f"✓ Downloaded {key}: {path}")
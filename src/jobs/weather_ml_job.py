@@ -2,101 +2,199 @@
 
 import argparse
 import sys
+from itertools import combinations
 from pathlib import Path
 from datetime import datetime
+from typing import List, Optional
 
 src_dir = Path(__file__).parent.parent
 if str(src_dir) not in sys.path:
     sys.path.insert(0, str(src_dir))
 
-from snowflake.snowpark import Session
-from snowflake.snowpark.functions import col, datediff, current_timestamp
+from snowflake.snowpark import DataFrame, Session
+from snowflake.snowpark.functions import (
+    col,
+    datediff,
+    current_timestamp,
+    avg,
+    count,
+    coalesce,
+    corr,
+    lit,
+    max as sf_max,
+    min as sf_min,
+    stddev,
+    sum as sf_sum,
+    when,
+)
+import numpy as np
 import pandas as pd
 
-from utils.snowflake.stage_utils import save_image_to_stage, save_dataframe_to_stage
+from utils.snowflake.stage_utils import save_many_to_stage, dataframe_to_parquet_buffer
 from utils.plotting.plot_utils import create_correlation_heatmap, calculate_correlation_summary_stats
 
 
-def load_weather_data(session: Session, table_name: str, days_back: int = 30, limit: int = 10000):
+def load_weather_data(
+    session: Session,
+    table_name: str,
+    days_back: int = 30,
+    limit: int = 10000,
+    variables: Optional[List[str]] = None,
+):
     """
     Load weather data from Snowflake table.
     
+    Duplicate (MSRMT_TIME, VARIABLE) observations are averaged in Snowflake, so the
+    result has one VALUE per pair plus N_OBS, the number of raw records behind it.
+    No rows are fetched locally.
+    
     Args:
         session: Snowpark session
         table_name: Name of weather table
         days_back: Number of days back to fetch data
         limit: Maximum number of records to fetch
+        variables: Optional known variable names; other variables are filtered out
+                   before the limit is applied
         
     Returns:
-        pandas DataFrame with weather data
+        Snowpark DataFrame with MSRMT_TIME, VARIABLE, VALUE and N_OBS columns
     """
     print(f"Loading weather data from {table_name} (last {days_back} days, limit {limit})...")
     
-    df = session.table(table_name).filter(
-        datediff("day", col("MSRMT_TIME"), current_timestamp()) <= days_back
-    ).limit(limit).to_pandas()
-    
-    print(f"Loaded {len(df)} records")
-    return df
+    # Only the three used columns are projected, and NULL values are dropped
+    # before they count against the limit.
+    weather = session.table(table_name).select("MSRMT_TIME", "VARIABLE", '"VALUE"').filter(
+        (datediff("day", col("MSRMT_TIME"), current_timestamp()) <= days_back) & col('"VALUE"').is_not_null()
+    )
+    if variables:
+        weather = weather.filter(col("VARIABLE").isin(variables))
+    query = weather.limit(limit).filter(col("VARIABLE").is_not_null()).group_by("MSRMT_TIME", "VARIABLE").agg(
+        avg(col('"VALUE"')).alias("VALUE"),
+        count("*").alias("N_OBS")
+    )
+    # Without a known variable list the data is read twice (variable listing, then
+    # aggregation); cache_result() pins the LIMIT sample so both see the same rows.
+    return query if variables else query.cache_result()
 
 
-def prepare_features(df: pd.DataFrame):
+def prepare_features(df: DataFrame, variables: Optional[List[str]] = None):
     """
-    Prepare features for ML - pivot weather variables into columns.
+    Prepare features for ML - pivot weather variables into columns in Snowflake.
+    
+    Each variable becomes a column V<i> (i is its position in the returned list),
+    which keeps the generated SQL free of quoting issues for arbitrary names.
     
     Args:
-        df: DataFrame with VARIABLE, VALUE, MSRMT_TIME columns
+        df: Snowpark DataFrame with one VALUE per (MSRMT_TIME, VARIABLE) pair
+        variables: Optional known variable names; skips the DISTINCT query when given
         
     Returns:
-        DataFrame with variables as columns
+        Tuple of (Snowpark DataFrame keyed on MSRMT_TIME with N_OBS and V<i> columns,
+        list of variable names in column order)
     """
-    print("Preparing features by pivoting weather variables...")
+    print("Preparing features by pivoting weather variables in Snowflake...")
     
-    weather_pivot = df.pivot_table(
-        index='MSRMT_TIME',
-        columns='VARIABLE',
-        values='VALUE',
-        aggfunc='mean'
-    )
+    if variables:
+        variables = sorted(set(variables))
+    else:
+        variables = sorted(row["VARIABLE"] for row in df.select("VARIABLE").distinct().collect())
     
-    weather_pivot = weather_pivot.dropna(axis=1, how='all').dropna(axis=0, how='all')
+    features = df.group_by("MSRMT_TIME").agg(
+        sf_sum(col("N_OBS")).alias("N_OBS"),
+        *[
+            avg(when(col("VARIABLE") == lit(variable), col('"VALUE"'))).alias(f"V{i}")
+            for i, variable in enumerate(variables)
+        ]
+    )
     
-    print(f"Features prepared: {len(weather_pivot)} time points, {len(weather_pivot.columns)} variables")
-    print(f"Variables: {list(weather_pivot.columns)}")
+    print(f"Variables: {variables}")
     
-    return weather_pivot
+    return features, variables
 
 
-def simple_baseline_ml(features_df: pd.DataFrame):
+def simple_baseline_ml(features_df: DataFrame, variables: list):
     """
     Simple baseline ML: calculate correlations and basic statistics.
     
+    Correlations, per-variable stats and counts are computed in a single
+    Snowflake aggregate, so only one row (O(k²) values) is fetched.
+    
     Args:
-        features_df: DataFrame with weather variables as columns
+        features_df: Snowpark DataFrame from prepare_features
+        variables: Variable names in V<i> column order
         
     Returns:
         Dictionary with results
     """
-    print("Running baseline ML analysis...")
+    print("Running baseline ML analysis in Snowflake...")
     
-    correlation_matrix = features_df.corr()
+    value_cols = [col(f"V{i}") for i in range(len(variables))]
+    pairs = list(combinations(range(len(variables)), 2))
     
-    summary_stats = calculate_correlation_summary_stats(correlation_matrix)
+    aggregates = [
+        count(coalesce(*value_cols) if len(value_cols) > 1 else value_cols[0]).alias("TIME_POINTS"),
+        sf_sum(col("N_OBS")).alias("RECORDS"),
+    ]
+    for i, value_col in enumerate(value_cols):
+        aggregates += [
+            count(value_col).alias(f"N_{i}"),
+            avg(value_col).alias(f"MEAN_{i}"),
+            stddev(value_col).alias(f"STD_{i}"),
+            sf_min(value_col).alias(f"MIN_{i}"),
+            sf_max(value_col).alias(f"MAX_{i}"),
+        ]
+    aggregates += [corr(value_cols[i], value_cols[j]).alias(f"C_{i}_{j}") for i, j in pairs]
+    
+    stats_row = features_df.agg(*aggregates).collect()[0]
     
-    feature_stats = features_df.describe().to_dict()
+    def as_float(value):
+        return float("nan") if value is None else float(value)
     
-    correlations_flat = []
-    for i, var1 in enumerate(correlation_matrix.columns):
-        for j, var2 in enumerate(correlation_matrix.columns):
-            if i != j:
-                correlations_flat.append({
-                    'variable1': var1,
-                    'variable2': var2,
-                    'correlation': correlation_matrix.loc[var1, var2]
-                })
+    # Variables with no values in the window are dropped, as the pandas pivot did.
+    kept = [i for i in range(len(variables)) if stats_row[f"N_{i}"]]
+    position = {i: n for n, i in enumerate(kept)}
+    columns = [variables[i] for i in kept]
     
-    correlations_df = pd.DataFrame(correlations_flat)
-    top_correlations = correlations_df.nlargest(10, 'correlation')
+    corr_values = np.full((len(kept), len(kept)), np.nan)
+    for i in kept:
+        # Constant columns have an undefined self-correlation, matching DataFrame.corr().
+        if as_float(stats_row[f"STD_{i}"]) > 0:
+            corr_values[position[i], position[i]] = 1.0
+    for i, j in pairs:
+        if i in position and j in position:
+            corr_values[position[i], position[j]] = corr_values[position[j], position[i]] = as_float(stats_row[f"C_{i}_{j}"])
+    correlation_matrix = pd.DataFrame(corr_values, index=columns, columns=columns)
+    
+    time_points = int(stats_row["TIME_POINTS"])
+    records_loaded = int(stats_row["RECORDS"] or 0)
+    print(f"Features prepared: {time_points} time points, {len(columns)} variables ({records_loaded} records)")
+    
+    summary_stats = calculate_correlation_summary_stats(correlation_matrix)
+    
+    feature_stats = {
+        variables[i]: {
+            'mean': as_float(stats_row[f"MEAN_{i}"]),
+            'std': as_float(stats_row[f"STD_{i}"]),
+            'min': as_float(stats_row[f"MIN_{i}"]),
+            'max': as_float(stats_row[f"MAX_{i}"]),
+        }
+        for i in kept
+    }
+    
+    corr_values = correlation_matrix.to_numpy()
+    iu, ju = np.triu_indices_from(corr_values, k=1)
+    pair_values = corr_values[iu, ju]
+    valid = ~np.isnan(pair_values)
+    iu, ju, pair_values = iu[valid], ju[valid], pair_values[valid]
+    top_n = min(10, pair_values.size)
+    top = np.argpartition(-pair_values, top_n - 1)[:top_n] if top_n else np.array([], dtype=int)
+    top = top[np.argsort(-pair_values[top])]
+    columns = correlation_matrix.columns.to_numpy()
+    top_correlations = pd.DataFrame({
+        'variable1': columns[iu[top]],
+        'variable2': columns[ju[top]],
+        'correlation': pair_values[top]
+    })
     
     print(f"Top correlations found:")
     for _, row in top_correlations.iterrows():
@@ -106,11 +204,19 @@ def simple_baseline_ml(features_df: pd.DataFrame):
         'correlation_matrix': correlation_matrix,
         'summary_stats': summary_stats,
         'feature_stats': feature_stats,
-        'top_correlations': top_correlations
+        'top_correlations': top_correlations,
+        'time_points': time_points,
+        'records_loaded': records_loaded
     }
 
 
-def main(data_table: str, days_back: int = 30, limit: int = 10000, stage_name: str = None):
+def main(
+    data_table: str,
+    days_back: int = 30,
+    limit: int = 10000,
+    stage_name: str = None,
+    variables: Optional[List[str]] = None,
+):
     """
     Main entrypoint for the ML job.
     
@@ -119,6 +225,7 @@ def main(data_table: str, days_back: int = 30, limit: int = 10000, stage_name: s
         days_back: Number of days back to fetch data
         limit: Maximum number of records to fetch
         stage_name: Stage name for saving outputs (optional)
+        variables: Weather variables to analyze (optional; default: all found)
         
     Returns:
         Dictionary with job results
@@ -129,21 +236,22 @@ def main(data_table: str, days_back: int = 30, limit: int = 10000, stage_name: s
     
     session = Session.builder.getOrCreate()
     
-    weather_df = load_weather_data(session, data_table, days_back, limit)
+    weather_df = load_weather_data(session, data_table, days_back, limit, variables)
+    
+    features_df, variables = prepare_features(weather_df, variables)
     
-    if weather_df.empty:
+    if not variables:
         return {"error": "No weather data found", "data_table": data_table}
     
-    features_df = prepare_features(weather_df)
+    results = simple_baseline_ml(features_df, variables)
+    variables_found = list(results['correlation_matrix'].columns)
     
-    if features_df.empty or len(features_df.columns) < 2:
+    if results['time_points'] == 0 or len(variables_found) < 2:
         return {
             "error": "Insufficient data for ML analysis",
-            "variables_found": list(features_df.columns) if not features_df.empty else []
+            "variables_found": variables_found
         }
     
-    results = simple_baseline_ml(features_df)
-    
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     
     outputs = {}
@@ -154,43 +262,32 @@ def main(data_table: str, days_back: int = 30, limit: int = 10000, stage_name: s
             results['correlation_matrix'],
             title=f"Weather Variable Correlations ({timestamp})"
         )
-        png_path = save_image_to_stage(
-            session,
-            heatmap_buf,
-            f"{timestamp}_weather_correlation.png",
-            stage_name,
-            subdirectory="output"
-        )
-        outputs['correlation_plot'] = png_path
-        print(f"  Saved correlation plot: {png_path}")
-        
-        csv_path = save_dataframe_to_stage(
-            session,
-            results['correlation_matrix'],
-            f"{timestamp}_correlation_matrix.csv",
-            stage_name,
-            subdirectory="output"
-        )
-        outputs['correlation_csv'] = csv_path
-        print(f"  Saved correlation matrix: {csv_path}")
-        
-        top_corr_path = save_dataframe_to_stage(
-            session,
-            results['top_correlations'],
-            f"{timestamp}_top_correlations.csv",
-            stage_name,
-            subdirectory="output"
+        artifacts = {
+            'correlation_plot': (heatmap_buf, f"{timestamp}_weather_correlation.png"),
+            'correlation_parquet': (
+                dataframe_to_parquet_buffer(results['correlation_matrix']),
+                f"{timestamp}_correlation_matrix.parquet",
+            ),
+            'top_correlations_parquet': (
+                dataframe_to_parquet_buffer(results['top_correlations']),
+                f"{timestamp}_top_correlations.parquet",
+            ),
+        }
+        # One PUT for all artifacts instead of a round-trip per file.
+        stage_paths = save_many_to_stage(
+            session, list(artifacts.values()), stage_name, subdirectory="output"
         )
-        outputs['top_correlations_csv'] = top_corr_path
-        print(f"  Saved top correlations: {top_corr_path}")
+        for key, stage_path in zip(artifacts, stage_paths):
+            outputs[key] = stage_path
+            print(f"  Saved {key}: {outputs[key]}")
     
     return {
         "status": "success",
         "timestamp": timestamp,
         "data_table": data_table,
-        "records_loaded": len(weather_df),
-        "time_points": len(features_df),
-        "variables": list(features_df.columns),
+        "records_loaded": results['records_loaded'],
+        "time_points": results['time_points'],
+        "variables": variables_found,
         "summary_stats": results['summary_stats'],
         "outputs": outputs
     }
@@ -202,6 +299,7 @@ if __name__ == "__main__":
     parser.add_argument("--days-back", type=int, default=30, help="Number of days back to fetch data")
     parser.add_argument("--limit", type=int, default=10000, help="Maximum number of records to fetch")
     parser.add_argument("--stage-name", help="Stage name for saving outputs (optional)")
+    parser.add_argument("--variables", nargs="+", help="Weather variables to analyze (optional; default: all found)")
     
     args = parser.parse_args()
     
@@ -209,5 +307,6 @@ if __name__ == "__main__":
         data_table=args.data_table,
         days_back=args.days_back,
         limit=args.limit,
-        stage_name=args.stage_name
+        stage_name=args.stage_name,
+        variables=args.variables
     )
@@ -4,6 +4,8 @@ from utils.snowflake.stage_utils import (
     save_image_to_stage,
     save_csv_to_stage,
     save_dataframe_to_stage,
+    dataframe_to_parquet_buffer,
+    save_many_to_stage,
     download_from_stage,
     download_from_stage_stream,
 )
@@ -13,6 +15,7 @@ from utils.plotting.plot_utils import (
 )
 from utils.spatial.spatial_utils import (
     build_multi_point_spatial_filter,
+    build_multi_point_spatial_filter_sql,
     match_points_to_dataframe,
 )
 from utils.snowflake.artifact_utils import (
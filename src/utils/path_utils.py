@@ -1,7 +1,9 @@
 """Path helpers for project utilities."""
 
+import os
+from functools import lru_cache
 from pathlib import Path
-from typing import Iterable, Optional
+from typing import Iterable, Optional, Tuple
 
 
 DEFAULT_MARKERS = (
@@ -20,14 +22,23 @@ def get_repo_root(
     """Find repository root by walking up from start_path.
 
     Defaults to this file's location and common repo markers.
+    Results are memoized per (start_path, markers) as passed, so repeat calls
+    do no filesystem work; relative paths are resolved first because their
+    meaning depends on the working directory.
     """
     markers = tuple(markers) if markers is not None else DEFAULT_MARKERS
-    start = Path(start_path).resolve() if start_path else Path(__file__).resolve()
-    start_dir = start if start.is_dir() else start.parent
+    if start_path is not None and not os.path.isabs(start_path):
+        start_path = str(Path(start_path).resolve())
+    return _find_repo_root(start_path, markers)
+
 
-    for path in (start_dir, *start_dir.parents):
+@lru_cache(maxsize=None)
+def _find_repo_root(start_path: Optional[str], markers: Tuple[str, ...]) -> Path:
+    start = Path(start_path).resolve() if start_path else Path(__file__).resolve()
+    start = start if start.is_dir() else start.parent
+    for path in (start, *start.parents):
         for marker in markers:
-            if (path / marker).exists():
+            if os.path.exists(os.path.join(path, marker)):
                 return path
 
-    return start_dir
+    return start
@@ -1,6 +1,9 @@
 """Plotting utilities."""
 
-from utils.plotting.plot_utils import create_correlation_heatmap, calculate_correlation_summary_stats
+from utils.plotting.plot_utils import (
+    create_correlation_heatmap,
+    calculate_correlation_summary_stats,
+)
 
 __all__ = [
     "create_correlation_heatmap",
@@ -2,14 +2,15 @@
 
 from io import BytesIO
 import pandas as pd
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 
 
 def create_correlation_heatmap(
     correlation_matrix: pd.DataFrame,
     title: str = "Correlation Matrix",
     figsize: tuple = (12, 12),
-    dpi: int = 300,
+    dpi: int = 120,
     cmap: str = "coolwarm",
     vmin: float = -1,
     vmax: float = 1,
@@ -17,6 +18,8 @@ def create_correlation_heatmap(
     """
     Create a correlation heatmap plot and return as BytesIO buffer.
     
+    Renders with the Agg canvas directly (no pyplot global figure state).
+    
     Args:
         correlation_matrix: pandas DataFrame with correlation values
         title: Plot title
@@ -30,17 +33,22 @@ def create_correlation_heatmap(
         BytesIO buffer containing PNG image data
     """
     buf = BytesIO()
-    plt.figure(figsize=figsize)
-    plt.imshow(correlation_matrix.values, cmap=cmap, aspect='auto', vmin=vmin, vmax=vmax)
-    plt.xticks(range(len(correlation_matrix.columns)), correlation_matrix.columns, rotation=90)
-    plt.yticks(range(len(correlation_matrix.index)), correlation_matrix.index)
-    plt.colorbar(label='Correlation')
-    plt.title(title)
-    plt.xlabel('Variable')
-    plt.ylabel('Variable')
-    plt.tight_layout()
-    plt.savefig(buf, format="png", dpi=dpi)
-    plt.close()
+    fig = Figure(figsize=figsize, dpi=dpi)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    image = ax.imshow(
+        correlation_matrix.values, cmap=cmap, aspect='auto', vmin=vmin, vmax=vmax, interpolation='nearest'
+    )
+    ax.set_xticks(range(len(correlation_matrix.columns)))
+    ax.set_xticklabels(correlation_matrix.columns, rotation=90)
+    ax.set_yticks(range(len(correlation_matrix.index)))
+    ax.set_yticklabels(correlation_matrix.index)
+    fig.colorbar(image, ax=ax, label='Correlation')
+    ax.set_title(title)
+    ax.set_xlabel('Variable')
+    ax.set_ylabel('Variable')
+    fig.tight_layout()
+    canvas.print_png(buf)
     buf.seek(0)
     return buf
 
@@ -7,6 +7,8 @@ from utils.snowflake.stage_utils import (
     save_image_to_stage,
     save_csv_to_stage,
     save_dataframe_to_stage,
+    dataframe_to_parquet_buffer,
+    save_many_to_stage,
     download_from_stage,
     download_from_stage_stream,
 )
@@ -24,6 +26,8 @@ __all__ = [
     "save_image_to_stage",
     "save_csv_to_stage",
     "save_dataframe_to_stage",
+    "dataframe_to_parquet_buffer",
+    "save_many_to_stage",
     "download_from_stage",
     "download_from_stage_stream",
     "download_job_artifacts",
@@ -1,5 +1,6 @@
 """Utilities for downloading and managing job artifacts"""
 
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, Optional, List
 from snowflake.snowpark import Session
@@ -21,7 +22,8 @@ def download_job_artifacts(
         result: Job result dictionary containing stage_path keys
         artifacts_dir: Directory to download artifacts to (default: project_root/artifacts)
         stage_path_keys: List of keys in result dict that contain stage paths.
-                        If None, looks for common keys: 'png_stage_path', 'csv_stage_path'
+                        If None, looks for common keys: 'png_stage_path', 'csv_stage_path',
+                        'parquet_stage_path'
         
     Returns:
         Dictionary mapping stage_path_key -> local Path of downloaded file
@@ -32,19 +34,21 @@ def download_job_artifacts(
     artifacts_dir.mkdir(exist_ok=True)
     
     if stage_path_keys is None:
-        stage_path_keys = ["png_stage_path", "csv_stage_path"]
+        stage_path_keys = ["png_stage_path", "csv_stage_path", "parquet_stage_path"]
     
-    downloaded = {}
+    keys = [key for key in stage_path_keys if key in result and result[key]]
+    if not keys:
+        return {}
     
-    for key in stage_path_keys:
-        if key in result and result[key]:
-            stage_path = result[key]
-            filename = stage_path.split("/")[-1]
-            local_path = download_from_stage(
+    # Each GET is a separate network round-trip, so fetch the artifacts concurrently.
+    with ThreadPoolExecutor(max_workers=min(8, len(keys))) as executor:
+        downloads = {
+            key: executor.submit(
+                download_from_stage,
                 session,
-                stage_path,
-                local_path=str(artifacts_dir / filename)
+                result[key],
+                local_path=str(artifacts_dir / result[key].split("/")[-1])
             )
-            downloaded[key] = local_path
-    
-    return downloaded
+            for key in keys
+        }
+        return {key: download.result() for key, download in downloads.items()}
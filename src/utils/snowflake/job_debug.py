@@ -1,88 +1,164 @@
 """Debug and logging utilities for Snowflake ML Jobs"""
 
 import re
+import sys
 import time
 import traceback
+import warnings
 from pathlib import Path
 from datetime import datetime
 from snowflake.ml.jobs import get_job
 from utils.path_utils import get_repo_root
 
+_status_cache = {}
+_log_progress = {}
+_JOB_ID_RE = re.compile(r'HELLO_[\w]+')
+_PERM_MARKERS = ("insufficient privileges", "access control")
+_LOGS_UNAVAILABLE_MARKERS = ("not found", "not available")
+_TERMINAL_STATUSES = ("DONE", "FAILED", "CANCELLED")
 
-def wait_for_job(job, timeout, poll_interval=15):
+
+def wait_for_job(
+    job, timeout, poll_floor=2, poll_cap=60, poll_growth=1.5, log_interval=60, poll_interval=None
+):
     """Wait for job completion with polling loop and overall timeout.
-    Downloads logs during polling and at completion."""
+    Polls with exponential backoff (poll_floor -> poll_cap, multiplied by
+    poll_growth each tick), resetting to poll_floor on status transitions.
+    Logs are re-downloaded only on status changes or every log_interval
+    seconds while polling, and always once at completion or timeout.
+    Returns (status, timed_out, log_file); log_file is None if that final
+    download failed, so show_job_logs fetches the logs itself.
+    poll_interval is a deprecated alias for poll_floor."""
+    if poll_interval is not None:
+        warnings.warn(
+            "wait_for_job(poll_interval=...) is deprecated; use poll_floor",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        poll_floor = poll_interval
+        poll_cap = max(poll_cap, poll_floor)
+    
     print(f"✓ Job created successfully! Job ID: {job.id}")
-    print(f"Waiting for job to complete (timeout at {timeout}s, polling every {poll_interval}s)...")
+    print(f"Waiting for job to complete (timeout at {timeout}s, polling every {poll_floor}-{poll_cap}s)...")
     
     logs_dir = get_repo_root() / "logs"
     logs_dir.mkdir(exist_ok=True)
     job_id = job.id.split(".")[-1] if "." in job.id else job.id
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     log_file = logs_dir / f"{timestamp}_{job_id}.log"
+    log_display = log_file.stem.rsplit("_", 1)[-1]
     
     start_time = time.time()
     timed_out = False
+    next_sleep = poll_floor
+    last_status = None
+    last_log_at = -log_interval
+    log_size = 0
+    is_tty = sys.stdout.isatty()
     
     while True:
         elapsed = time.time() - start_time
+        current_status = _get_status_cached(job)
         
         if elapsed >= timeout:
             timed_out = True
             print(f"\n⚠ Overall timeout ({timeout}s) reached")
-            print(f"Current status: {job.status}")
-            _download_logs(job, log_file)
-            return job.status, timed_out, log_file
-        
-        current_status = job.status
+            print(f"Current status: {current_status}")
+            log_size = _download_logs(job, log_file)
+            _log_progress.pop(str(log_file), None)
+            if log_size is None:
+                log_file = None
+            return current_status, timed_out, log_file
         
-        log_size = _download_logs(job, log_file)
+        is_terminal = current_status in _TERMINAL_STATUSES
+        if is_terminal or current_status != last_status or elapsed - last_log_at >= log_interval:
+            log_size = _download_logs(job, log_file)
+            last_log_at = elapsed
         
-        log_display = log_file.stem
-        if "_" in log_display:
-            parts = log_display.split("_")
-            if len(parts) >= 2:
-                log_display = parts[-1]
-        log_info = f"{log_display}.log" if log_size > 0 else f"{log_display}..."
+        log_info = f"{log_display}.log" if log_size else f"{log_display}..."
         
         status_line = f"  [{int(elapsed)}s] {current_status} | log: {log_info}"
-        padded_line = status_line.ljust(120)
-        print(f"\r{padded_line}", end="", flush=True)
+        if is_tty:
+            padded_line = status_line.ljust(120)
+            print(f"\r{padded_line}", end="", flush=True)
+        elif current_status != last_status:
+            print(status_line)
         
-        if current_status in ["DONE", "FAILED", "CANCELLED"]:
+        if is_terminal:
             print(f"\nFinal status: {current_status} (completed in {int(elapsed)}s)")
-            _download_logs(job, log_file)
+            # Nothing polls this job again, so drop its per-job state.
+            _status_cache.pop(job.id, None)
+            _log_progress.pop(str(log_file), None)
+            if log_size is None:
+                log_file = None
             return current_status, timed_out, log_file
         
-        time.sleep(poll_interval)
+        if last_status is not None and current_status != last_status:
+            next_sleep = poll_floor
+        last_status = current_status
+        
+        time.sleep(min(next_sleep, max(0, timeout - elapsed)))
+        next_sleep = min(poll_cap, next_sleep * poll_growth)
+
+
+def _get_status_cached(job, ttl=1.0):
+    """Helper to read job.status at most once per ttl seconds per job.
+    Each job.status access is a round-trip to the Snowflake control plane.
+    Terminal statuses never change, so they are served from cache indefinitely."""
+    now = time.monotonic()
+    cached = _status_cache.get(job.id)
+    if cached is not None and (cached[1] in _TERMINAL_STATUSES or now - cached[0] < ttl):
+        return cached[1]
+    status = job.status
+    _status_cache[job.id] = (now, status)
+    return status
 
 
 def _download_logs(job, log_file):
-    """Helper to download job logs to file (overwrites existing).
-    Returns the size of logs written (0 if none)."""
+    """Helper to download job logs to file.
+    If the fetched logs extend what was written last time, only the new suffix
+    is appended; otherwise (first call, rotated/truncated log) the file is rewritten.
+    Returns the size of logs written (0 if none, None if the download failed)."""
     try:
         logs = job.get_logs(verbose=True) or ""
         if logs:
-            with open(log_file, "w") as f:
-                f.write(logs)
+            key = str(log_file)
+            written, tail = _log_progress.get(key, (0, ""))
+            if (
+                written
+                and len(logs) >= written
+                and logs[written - len(tail):written] == tail
+                and Path(log_file).exists()
+            ):
+                if len(logs) > written:
+                    with open(log_file, "a") as f:
+                        f.write(logs[written:])
+            else:
+                Path(log_file).write_text(logs)
+            _log_progress[key] = (len(logs), logs[-256:])
             return len(logs)
         return 0
     except Exception as e:
         if not hasattr(_download_logs, '_last_error') or _download_logs._last_error != str(e):
             _download_logs._last_error = str(e)
-            if "not found" not in str(e).lower() and "not available" not in str(e).lower():
+            err_lower = str(e).lower()
+            if not any(m in err_lower for m in _LOGS_UNAVAILABLE_MARKERS):
                 print(f"\n⚠ Could not download logs during polling: {e}")
-        return 0
+        return None
 
 
 def show_job_logs(job, tail_chars=10000, log_file=None):
     """Save job logs to file and show summary.
-    If log_file is provided, will download fresh logs to that file.
-    Otherwise, generates a new filename."""
+    If log_file already holds logs (e.g. written by wait_for_job), only its
+    tail is read back from disk instead of downloading the full log again.
+    Otherwise downloads fresh logs, generating a new filename if needed."""
     print(f"\n=== Job Logs ===")
     try:
-        logs = job.get_logs(verbose=True) or ""
-        if logs:
+        if log_file is None or not Path(log_file).exists() or Path(log_file).stat().st_size == 0:
+            logs = job.get_logs(verbose=True) or ""
+            if not logs:
+                print("No logs available")
+                return
             if log_file is None:
                 logs_dir = get_repo_root() / "logs"
                 logs_dir.mkdir(exist_ok=True)
@@ -90,26 +166,54 @@ def show_job_logs(job, tail_chars=10000, log_file=None):
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 log_file = logs_dir / f"{timestamp}_{job_id}.log"
             
-            with open(log_file, "w") as f:
-                f.write(logs)
-            
-            log_lines = logs.split("\n")
-            print(f"✓ Logs saved to: {log_file}")
-            print(f"  Total lines: {len(log_lines)}")
-            
-            if tail_chars > 0 and len(logs) > tail_chars:
-                print(f"\n=== Last {tail_chars} characters of logs ===")
-                print(logs[-tail_chars:])
-        else:
-            print("No logs available")
+            Path(log_file).write_text(logs)
+            del logs
+        
+        line_count, tail, truncated = _read_log_tail(log_file, tail_chars)
+        print(f"✓ Logs saved to: {log_file}")
+        print(f"  Total lines: {line_count}")
+        
+        if tail_chars > 0 and truncated:
+            print(f"\n=== Last {tail_chars} characters of logs ===")
+            print(tail)
     except Exception as log_err:
         print(f"✗ Could not get logs: {log_err}")
         print(f"Traceback: {traceback.format_exc()}")
 
 
+def _read_log_tail(log_file, tail_chars, chunk_size=1 << 20):
+    """Helper to summarize a log file without loading it into memory.
+    The tail is read from a byte window wide enough for tail_chars UTF-8
+    characters, decoded, then trimmed, so a character split by the seek is
+    dropped rather than shown.
+    Returns (line_count, last tail_chars characters, whether the tail is shorter
+    than the whole log)."""
+    line_count = 0
+    last_byte = b""
+    with open(log_file, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            line_count += chunk.count(b"\n")
+            last_byte = chunk[-1:]
+        size = f.tell()
+        if last_byte and last_byte != b"\n":
+            line_count += 1
+        tail = ""
+        truncated = False
+        if tail_chars > 0:
+            # UTF-8 uses at most 4 bytes per character; 3 more cover a split one.
+            start = max(0, size - 4 * tail_chars - 3)
+            f.seek(start)
+            tail = f.read().decode("utf-8", errors="replace")
+            truncated = start > 0 or len(tail) > tail_chars
+            tail = tail[-tail_chars:]
+    return line_count, tail, truncated
+
+
 def handle_job_result(job, timed_out=False):
     """Handle job result based on status"""
-    if job.status == "DONE":
+    status = _get_status_cached(job)
+    _status_cache.pop(job.id, None)
+    if status == "DONE":
         print(f"\n=== Job Result ===")
         try:
             result = job.result()
@@ -119,11 +223,11 @@ def handle_job_result(job, timed_out=False):
             print(f"✗ Could not get result: {result_err}")
             print(f"Traceback: {traceback.format_exc()}")
             return None
-    elif job.status == "FAILED":
+    elif status == "FAILED":
         print(f"\n✗ Job failed - check logs above for details")
         return None
     else:
-        print(f"\n⚠ Job status: {job.status}")
+        print(f"\n⚠ Job status: {status}")
         if timed_out:
             print(f"  Job will continue running - check Snowflake UI for final status")
         else:
@@ -134,12 +238,13 @@ def handle_job_result(job, timed_out=False):
 def diagnose_job_failure(error, session, session_params):
     """Diagnose job creation failure"""
     error_msg = str(error)
-    job_id_match = re.search(r'HELLO_[\w]+', error_msg)
+    err_lower = error_msg.lower()
+    job_id_match = _JOB_ID_RE.search(error_msg)
     job_id = job_id_match.group(0) if job_id_match else None
     
     print(f"\n✗ Job creation failed: {error_msg[:200]}...")
     
-    if "insufficient privileges" in error_msg.lower() or "access control" in error_msg.lower():
+    if any(m in err_lower for m in _PERM_MARKERS):
         print(f"\n  ⚠ Permission error detected!")
         role = session_params.get("role") if session_params else None
         role_display = role if role else "<role>"
@@ -161,8 +266,11 @@ def diagnose_job_failure(error, session, session_params):
             print(f"  ✗ Failed to get job via API: {job_err}")
             print(f"  Traceback: {traceback.format_exc()}")
             
+            # Submit both lookups without blocking so their round-trips overlap;
+            # each is still awaited and reported separately.
+            history_job = logs_job = None
             try:
-                job_history = session.sql(f"""
+                history_job = session.sql(f"""
                     SELECT name, status, message, created_time, completed_time
                     FROM TABLE(SNOWFLAKE.SPCS.GET_JOB_HISTORY(
                         created_time_start => DATEADD('hour', -6, CURRENT_TIMESTAMP()),
@@ -171,16 +279,7 @@ def diagnose_job_failure(error, session, session_params):
                     WHERE name = '{job_id}'
                     ORDER BY created_time DESC
                     LIMIT 1
-                """).collect()
-                
-                if job_history:
-                    row = job_history[0]
-                    status = row["status"] if "status" in row else "UNKNOWN"
-                    print(f"  Status: {status}")
-                    if "message" in row and row["message"]:
-                        print(f"  Message: {row['message']}")
-                else:
-                    print(f"  Job not found in history yet")
+                """).collect(block=False)
             except Exception as hist_err:
                 print(f"  ✗ Could not query job history: {hist_err}")
                 print(f"  Traceback: {traceback.format_exc()}")
@@ -194,18 +293,45 @@ def diagnose_job_failure(error, session, session_params):
                 ORDER BY timestamp DESC
                 LIMIT 50
                 """
-                container_logs = session.sql(logs_query).collect()
-                if container_logs:
-                    print(f"\n  === Container Logs (last 50 lines) ===")
-                    for log_row in container_logs[:50]:
-                        log_msg = log_row["LOG"] if "LOG" in log_row else str(log_row)
-                        timestamp = log_row["TIMESTAMP"] if "TIMESTAMP" in log_row else ""
-                        print(f"  [{timestamp}] {log_msg}")
+                logs_job = session.sql(logs_query).collect(block=False)
             except Exception as log_err:
-                print(f"  ✗ Could not get container logs: {log_err}")
-                if "insufficient privileges" in str(log_err).lower():
-                    print(f"  Need MONITOR privilege to read logs")
-                else:
+                _report_container_log_error(log_err)
+            
+            if history_job is not None:
+                try:
+                    job_history = history_job.result()
+                    
+                    if job_history:
+                        row = job_history[0]
+                        status = row["status"] if "status" in row else "UNKNOWN"
+                        print(f"  Status: {status}")
+                        if "message" in row and row["message"]:
+                            print(f"  Message: {row['message']}")
+                    else:
+                        print(f"  Job not found in history yet")
+                except Exception as hist_err:
+                    print(f"  ✗ Could not query job history: {hist_err}")
                     print(f"  Traceback: {traceback.format_exc()}")
+            
+            if logs_job is not None:
+                try:
+                    container_logs = logs_job.result()
+                    if container_logs:
+                        print(f"\n  === Container Logs (last 50 lines) ===")
+                        for log_row in container_logs[:50]:
+                            log_msg = log_row["LOG"] if "LOG" in log_row else str(log_row)
+                            timestamp = log_row["TIMESTAMP"] if "TIMESTAMP" in log_row else ""
+                            print(f"  [{timestamp}] {log_msg}")
+                except Exception as log_err:
+                    _report_container_log_error(log_err)
         
         print(f"\n  Check Snowflake UI: Compute → Jobs → {job_id}")
+
+
+def _report_container_log_error(log_err):
+    """Helper to print a container log query failure with a privilege hint."""
+    print(f"  ✗ Could not get container logs: {log_err}")
+    if "insufficient privileges" in str(log_err).lower():
+        print(f"  Need MONITOR privilege to read logs")
+    else:
+        print(f"  Traceback: {traceback.format_exc()}")
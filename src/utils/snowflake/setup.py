@@ -1,12 +1,30 @@
 """Setup utilities for Snowflake ML Jobs"""
 
 from snowflake.snowpark import Session
+from snowflake.snowpark.exceptions import SnowparkSQLException
 import os
-import tomli
 import time
+from functools import lru_cache
 from pathlib import Path
 from utils.path_utils import get_repo_root
 
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    import tomli as tomllib
+
+_POOL_READY_TTL = 60
+_pool_ready_cache = {}
+
+
+@lru_cache(maxsize=None)
+def _load_connection_params(config_path):
+    """Helper to parse the ML_connection block of a config.toml (cached per path)."""
+    with open(config_path, "rb") as f:
+        config = tomllib.load(f)
+    return config["connections"]["ML_connection"]
+
+
 def get_session_from_config(config_path=None):
     """Load Snowflake session from config.toml."""
     if config_path is None:
@@ -14,16 +32,13 @@ def get_session_from_config(config_path=None):
         if env_path:
             config_path = Path(env_path)
         else:
-            repo_root = get_repo_root()
             candidates = [
-                repo_root / ".snowflake" / "config.toml",
+                get_repo_root() / ".snowflake" / "config.toml",
                 Path.home() / ".snowflake" / "config.toml",
             ]
             config_path = next((p for p in candidates if p.exists()), candidates[0])
 
-    with open(config_path, "rb") as f:
-        config = tomli.load(f)
-        connection_params = config["connections"]["ML_connection"]
+    connection_params = _load_connection_params(str(Path(config_path).resolve()))
     
     session_params = {
         "account": connection_params["SNOWFLAKE_ACCOUNT"],
@@ -41,53 +56,75 @@ def get_session_from_config(config_path=None):
     return session, session_params
 
 
+def _get_compute_pool_state(session, target_pool):
+    """Helper to read one compute pool's state via DESCRIBE (None if not found).
+    Avoids SHOW COMPUTE POOLS, which lists every pool visible to the role.
+    Errors other than a missing pool (permissions, connectivity) are raised."""
+    try:
+        rows = session.sql(f"DESCRIBE COMPUTE POOL {target_pool}").collect()
+    except SnowparkSQLException as e:
+        if "does not exist" in str(e).lower():
+            return None
+        raise
+    return rows[0]["state"] if rows else None
+
+
 def ensure_compute_pool_ready(session, target_pool, max_wait=60):
-    """Ensure compute pool is in IDLE or RUNNING state"""
-    pools = session.sql("SHOW COMPUTE POOLS").collect()
-    for pool in pools:
-        if pool["name"].upper() == target_pool.upper():
-            state = pool["state"]
-            if state in ['IDLE', 'RUNNING']:
-                return True
-            elif state == 'SUSPENDED':
-                print(f"Resuming compute pool {target_pool}...")
-                try:
-                    session.sql(f"ALTER COMPUTE POOL {target_pool} RESUME").collect()
-                    wait_time = 0
-                    while wait_time < max_wait:
-                        time.sleep(3)
-                        wait_time += 3
-                        pools = session.sql("SHOW COMPUTE POOLS").collect()
-                        for p in pools:
-                            if p["name"].upper() == target_pool.upper():
-                                current_state = p["state"]
-                                if current_state in ['IDLE', 'RUNNING']:
-                                    return True
-                                elif current_state == 'SUSPENDED':
-                                    print(f"✗ Compute pool failed to start")
-                                    return False
-                    print(f"⚠ Compute pool still starting after {max_wait}s")
-                    return False
-                except Exception as e:
-                    print(f"✗ Failed to resume compute pool: {e}")
-                    return False
-            elif state == 'STARTING':
-                print(f"Waiting for compute pool to become ready...")
-                wait_time = 0
-                while wait_time < max_wait:
-                    time.sleep(3)
-                    wait_time += 3
-                    pools = session.sql("SHOW COMPUTE POOLS").collect()
-                    for p in pools:
-                        if p["name"].upper() == target_pool.upper():
-                            if p["state"] in ['IDLE', 'RUNNING']:
-                                return True
-                print(f"⚠ Compute pool still starting after {max_wait}s")
-                return False
-            else:
-                print(f"⚠ Compute pool state is {state} - may cause issues")
-                return False
-    print(f"✗ Compute pool {target_pool} not found")
+    """Ensure compute pool is in IDLE or RUNNING state.
+    A pool seen ready within the last _POOL_READY_TTL seconds is not queried again.
+    Returns False if the pool is missing or does not become ready. An error from
+    the initial DESCRIBE other than a missing pool (e.g. insufficient privileges)
+    is raised; errors while waiting for a resume are reported and retried."""
+    pool_key = target_pool.upper()
+    ready_at = _pool_ready_cache.get(pool_key)
+    if ready_at is not None and time.monotonic() - ready_at < _POOL_READY_TTL:
+        return True
+    
+    state = _get_compute_pool_state(session, target_pool)
+    if state is None:
+        print(f"✗ Compute pool {target_pool} not found")
+        return False
+    if state in ['IDLE', 'RUNNING']:
+        _pool_ready_cache[pool_key] = time.monotonic()
+        return True
+    _pool_ready_cache.pop(pool_key, None)
+    
+    if state == 'SUSPENDED':
+        print(f"Resuming compute pool {target_pool}...")
+        try:
+            session.sql(f"ALTER COMPUTE POOL {target_pool} RESUME").collect()
+        except Exception as e:
+            print(f"✗ Failed to resume compute pool: {e}")
+            return False
+        fail_if_suspended = True
+    elif state == 'STARTING':
+        print(f"Waiting for compute pool to become ready...")
+        fail_if_suspended = False
+    else:
+        print(f"⚠ Compute pool state is {state} - may cause issues")
+        return False
+    
+    # Back off 3s -> 6s -> 12s ... (capped at 30s) so fast starts are seen early
+    # without polling every 3s through a slow one.
+    wait_time = 0
+    backoff = 3
+    while wait_time < max_wait:
+        sleep_for = min(backoff, max_wait - wait_time)
+        time.sleep(sleep_for)
+        wait_time += sleep_for
+        backoff = min(backoff * 2, 30)
+        try:
+            current_state = _get_compute_pool_state(session, target_pool)
+        except Exception as e:
+            print(f"⚠ Could not read compute pool state, retrying: {e}")
+            continue
+        if current_state in ['IDLE', 'RUNNING']:
+            _pool_ready_cache[pool_key] = time.monotonic()
+            return True
+        if current_state == 'SUSPENDED' and fail_if_suspended:
+            print(f"✗ Compute pool failed to start")
+            return False
+    print(f"⚠ Compute pool still starting after {max_wait}s")
     return False
 
 
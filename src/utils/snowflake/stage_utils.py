@@ -1,11 +1,15 @@
 """Utilities for saving and downloading artifacts from Snowflake stages"""
 
+import os
+import tempfile
 from io import BytesIO
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional, Tuple, Union
 from snowflake.snowpark import Session
 import pandas as pd
 
+_PARQUET_CHUNK_ROWS = 100_000
+
 
 def save_image_to_stage(
     session: Session,
@@ -80,6 +84,51 @@ def save_csv_to_stage(
     return stage_path
 
 
+def save_many_to_stage(
+    session: Session,
+    items: List[Tuple[Union[bytes, BytesIO], str]],
+    stage_name: str,
+    subdirectory: str = "output",
+    overwrite: bool = True,
+    parallel: int = 8,
+) -> List[str]:
+    """
+    Save several in-memory files to a Snowflake stage with a single PUT.
+    
+    The buffers are spilled to a temporary directory and uploaded with one
+    wildcard PUT, which Snowflake parallelizes internally. Prefer this over
+    repeated single-file saves when a job emits many artifacts.
+    
+    Args:
+        session: Snowpark session
+        items: List of (data, filename) tuples; data is bytes or a BytesIO buffer
+        stage_name: Stage name (e.g., "AI_ML.ML.STAGE_ML_SANDBOX_TEST")
+        subdirectory: Subdirectory within stage (default: "output")
+        overwrite: Whether to overwrite existing files
+        parallel: Number of upload threads used by PUT
+        
+    Returns:
+        List of stage path strings, in the order of items
+    """
+    if not items:
+        return []
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for data, filename in items:
+            if isinstance(data, BytesIO):
+                data = data.getvalue()
+            Path(tmp_dir, filename).write_bytes(data)
+        session.file.put(
+            f"{Path(tmp_dir).as_posix()}/*",
+            f"@{stage_name}/{subdirectory}/",
+            parallel=parallel,
+            auto_compress=False,
+            overwrite=overwrite,
+        )
+    
+    return [f"@{stage_name}/{subdirectory}/{filename}" for _, filename in items]
+
+
 def save_dataframe_to_stage(
     session: Session,
     df: pd.DataFrame,
@@ -108,16 +157,7 @@ def save_dataframe_to_stage(
         csv_data = df.to_csv(index=True)
         return save_csv_to_stage(session, csv_data, filename, stage_name, subdirectory, overwrite)
     elif format.lower() == "parquet":
-        try:
-            import pyarrow as pa
-            import pyarrow.parquet as pq
-        except ImportError:
-            raise ImportError("pyarrow is required for Parquet format")
-        
-        buffer = BytesIO()
-        table = pa.Table.from_pandas(df)
-        pq.write_table(table, buffer)
-        buffer.seek(0)
+        buffer = dataframe_to_parquet_buffer(df)
         
         stage_path = f"@{stage_name}/{subdirectory}/{filename}"
         session.file.put_stream(
@@ -131,6 +171,44 @@ def save_dataframe_to_stage(
         raise ValueError(f"Unsupported format: {format}. Use 'csv' or 'parquet'")
 
 
+def dataframe_to_parquet_buffer(df: pd.DataFrame) -> BytesIO:
+    """
+    Serialize a pandas DataFrame to Parquet in memory.
+    
+    Used by save_dataframe_to_stage, and by callers that batch several artifacts
+    into one save_many_to_stage upload.
+    
+    Args:
+        df: pandas DataFrame
+        
+    Returns:
+        BytesIO buffer positioned at the start of the Parquet data
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("pyarrow is required for Parquet format")
+    
+    # zstd + dictionary encoding keeps upload bytes small; large frames are
+    # converted and written in row-group chunks to bound peak memory.
+    buffer = BytesIO()
+    nthreads = os.cpu_count()
+    parquet_options = dict(compression="zstd", use_dictionary=True, data_page_size=1 << 20)
+    if len(df) <= _PARQUET_CHUNK_ROWS:
+        pq.write_table(pa.Table.from_pandas(df, nthreads=nthreads), buffer, **parquet_options)
+    else:
+        # Infer the schema from the whole frame: a column that is all-null in the
+        # first chunk would otherwise be typed null and break on later chunks.
+        schema = pa.Schema.from_pandas(df)
+        with pq.ParquetWriter(buffer, schema, **parquet_options) as writer:
+            for start in range(0, len(df), _PARQUET_CHUNK_ROWS):
+                chunk = df.iloc[start:start + _PARQUET_CHUNK_ROWS]
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, nthreads=nthreads))
+    buffer.seek(0)
+    return buffer
+
+
 def download_from_stage(
     session: Session,
     stage_path: str,
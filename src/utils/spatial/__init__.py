@@ -1,8 +1,9 @@
 """Spatial utilities."""
 
-from utils.spatial.spatial_utils import build_multi_point_spatial_filter, match_points_to_dataframe
+from utils.spatial.spatial_utils import build_multi_point_spatial_filter, build_multi_point_spatial_filter_sql, match_points_to_dataframe
 
 __all__ = [
     "build_multi_point_spatial_filter",
+    "build_multi_point_spatial_filter_sql",
     "match_points_to_dataframe",
 ]
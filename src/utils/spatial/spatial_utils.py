@@ -1,10 +1,14 @@
 """Utilities for spatial/geographic data operations"""
 
 from typing import List, Tuple, Any
-from snowflake.snowpark.functions import col, abs as sf_abs
+from snowflake.snowpark.functions import sql_expr
 from snowflake.snowpark.column import Column
+import numpy as np
 import pandas as pd
 
+_MATCH_CHUNK_CELLS = 1 << 24
+_KDTREE_MIN_CELLS = 10_000_000
+
 
 def build_multi_point_spatial_filter(
     lat_lon_pairs: List[Tuple[float, float]],
@@ -15,6 +19,15 @@ def build_multi_point_spatial_filter(
     """
     Build a Snowpark filter condition for multiple lat/lon points using OR logic.
     
+    A row matches when it lies within tolerance of some point on both axes.
+    Each point is a pair of SARGable BETWEEN ranges rather than abs(col - x),
+    so Snowflake can prune micro-partitions on min/max; a BETWEEN bounding box
+    over all points is ANDed in front as a cheap pre-filter.
+    
+    The predicate is emitted as one SQL fragment (see
+    build_multi_point_spatial_filter_sql) rather than a Column expression tree,
+    so thousands of points cost one string instead of a node tree per point.
+    
     Args:
         lat_lon_pairs: List of (lat, lon) tuples
         lat_col: Name of latitude column
@@ -22,24 +35,48 @@ def build_multi_point_spatial_filter(
         tolerance: Tolerance in degrees for matching (default 0.0001 ≈ 11 meters)
         
     Returns:
-        Combined filter condition (Column) that can be used with DataFrame.filter()
+        Filter condition (Column) that can be used with DataFrame.filter()
     """
-    if not lat_lon_pairs:
-        raise ValueError("lat_lon_pairs cannot be empty")
+    return sql_expr(build_multi_point_spatial_filter_sql(lat_lon_pairs, lat_col, lon_col, tolerance))
+
+
+def build_multi_point_spatial_filter_sql(
+    lat_lon_pairs: List[Tuple[float, float]],
+    lat_col: str = "LAT",
+    lon_col: str = "LON",
+    tolerance: float = 0.0001,
+) -> str:
+    """
+    Build the multi-point filter as a raw SQL predicate string.
     
-    filter_conditions = []
-    for lat, lon in lat_lon_pairs:
-        condition = (
-            (sf_abs(col(lat_col) - lat) <= tolerance) & 
-            (sf_abs(col(lon_col) - lon) <= tolerance)
-        )
-        filter_conditions.append(condition)
+    Same semantics as build_multi_point_spatial_filter; usable directly in
+    session.sql() WHERE clauses or via DataFrame.filter(sql_expr(...)).
     
-    combined_filter = filter_conditions[0]
-    for condition in filter_conditions[1:]:
-        combined_filter = combined_filter | condition
+    Args:
+        lat_lon_pairs: List of (lat, lon) tuples
+        lat_col: Name of latitude column
+        lon_col: Name of longitude column
+        tolerance: Tolerance in degrees for matching (default 0.0001 ≈ 11 meters)
+        
+    Returns:
+        SQL boolean expression string
+    """
+    if not lat_lon_pairs:
+        raise ValueError("lat_lon_pairs cannot be empty")
     
-    return combined_filter
+    points = sorted(set((float(lat), float(lon)) for lat, lon in lat_lon_pairs))
+    lats = [lat for lat, _ in points]
+    lons = [lon for _, lon in points]
+    point_conditions = " OR ".join(
+        f"({lat_col} BETWEEN {lat - tolerance!r} AND {lat + tolerance!r}"
+        f" AND {lon_col} BETWEEN {lon - tolerance!r} AND {lon + tolerance!r})"
+        for lat, lon in points
+    )
+    return (
+        f"({lat_col} BETWEEN {min(lats) - tolerance!r} AND {max(lats) + tolerance!r}"
+        f" AND {lon_col} BETWEEN {min(lons) - tolerance!r} AND {max(lons) + tolerance!r}"
+        f" AND ({point_conditions}))"
+    )
 
 
 def match_points_to_dataframe(
@@ -67,12 +104,85 @@ def match_points_to_dataframe(
     """
     df = df.copy()
     df[match_col] = None
+    if not lat_lon_pairs:
+        return df
+    
+    # Compare every row against every point in one broadcast pass (rows x points)
+    # instead of one boolean-mask pass over the DataFrame per point.
+    lats = df[lat_col].to_numpy(dtype=np.float64)
+    lons = df[lon_col].to_numpy(dtype=np.float64)
+    point_lats = np.array([p[0] for p in lat_lon_pairs], dtype=np.float64)
+    point_lons = np.array([p[1] for p in lat_lon_pairs], dtype=np.float64)
+    match_ids = np.empty(len(lat_lon_pairs), dtype=object)
+    match_ids[:] = [p[2] for p in lat_lon_pairs]
     
-    for lat, lon, match_id in lat_lon_pairs:
-        mask = (
-            ((df[lat_col] - lat).abs() <= tolerance) &
-            ((df[lon_col] - lon).abs() <= tolerance)
+    if len(df) * len(lat_lon_pairs) >= _KDTREE_MIN_CELLS:
+        last_hit = _last_match_kdtree(lats, lons, point_lats, point_lons, tolerance)
+        if last_hit is not None:
+            matched = last_hit >= 0
+            assigned = np.full(len(df), None, dtype=object)
+            assigned[matched] = match_ids[last_hit[matched]]
+            df[match_col] = assigned
+            return df
+    
+    # Walk the points in chunks so the rows x points mask stays around
+    # _MATCH_CHUNK_CELLS booleans; later chunks overwrite earlier ones, so when
+    # several points match a row the last one wins (as with sequential assignment).
+    assigned = np.full(len(df), None, dtype=object)
+    chunk = max(1, _MATCH_CHUNK_CELLS // max(1, len(df)))
+    for start in range(0, len(lat_lon_pairs), chunk):
+        stop = start + chunk
+        hits = (
+            (np.abs(lats[:, None] - point_lats[None, start:stop]) <= tolerance) &
+            (np.abs(lons[:, None] - point_lons[None, start:stop]) <= tolerance)
         )
-        df.loc[mask, match_col] = match_id
+        matched = hits.any(axis=1)
+        last_hit = hits.shape[1] - 1 - hits[:, ::-1].argmax(axis=1)
+        assigned[matched] = match_ids[start:stop][last_hit[matched]]
+    df[match_col] = assigned
     
     return df
+
+
+def _last_match_kdtree(lats, lons, point_lats, point_lons, tolerance):
+    """
+    Find, per row, the highest-index point within tolerance using a KD-tree.
+    
+    Uses the Chebyshev (p=inf) metric, which is the same box test as the broadcast
+    path. Per-row neighbour counts come from one query_ball_point(return_length=True)
+    call; the rows are then queried for that many nearest points at once and the
+    highest valid index is taken with a row-wise max, so no Python loop runs per row.
+    Cost is O(N * K log M) for K = most points matching any one row, instead of the
+    O(N * M) broadcast.
+    
+    Returns:
+        int array of point indices (-1 where unmatched), or None if scipy is unavailable
+    """
+    try:
+        from scipy.spatial import cKDTree
+    except ImportError:
+        return None
+    
+    n_points = len(point_lats)
+    tree = cKDTree(np.column_stack([point_lats, point_lons]))
+    rows = np.column_stack([lats, lons])
+    last_hit = np.full(len(lats), -1, dtype=np.int64)
+    
+    counts = tree.query_ball_point(rows, r=tolerance, p=np.inf, return_length=True)
+    max_hits = int(counts.max()) if len(counts) else 0
+    if max_hits == 0:
+        return last_hit
+    
+    # query() keeps neighbours strictly closer than distance_upper_bound; nudge it up
+    # one ulp so points exactly at the tolerance still match, as in the broadcast path.
+    upper_bound = np.nextafter(tolerance, np.inf)
+    ks = list(range(1, max_hits + 1))
+    step = max(1, _MATCH_CHUNK_CELLS // max_hits)
+    matched_rows = np.flatnonzero(counts)
+    for start in range(0, len(matched_rows), step):
+        row_ix = matched_rows[start:start + step]
+        _, ix = tree.query(rows[row_ix], k=ks, p=np.inf, distance_upper_bound=upper_bound)
+        # Missing neighbours are reported as index n_points.
+        ix = np.where(ix < n_points, ix, -1)
+        last_hit[row_ix] = ix.max(axis=1)
+    return last_hit
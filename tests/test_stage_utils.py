@@ -0,0 +1,28 @@
+"""Tests for utils.snowflake.stage_utils"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pq = pytest.importorskip("pyarrow.parquet")
+pytest.importorskip("snowflake.snowpark")
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from utils.snowflake import stage_utils
+
+
+def test_parquet_chunks_keep_columns_that_start_null(monkeypatch):
+    monkeypatch.setattr(stage_utils, "_PARQUET_CHUNK_ROWS", 3)
+    df = pd.DataFrame({
+        "id": range(8),
+        "label": [None] * 4 + ["a", "b", "c", "d"],
+        "score": pd.array([None] * 4 + [1, 2, 3, 4], dtype="Int64"),
+    })
+    
+    buffer = stage_utils.dataframe_to_parquet_buffer(df)
+    
+    result = pq.read_table(buffer).to_pandas()
+    pd.testing.assert_frame_equal(result, df)